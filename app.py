@@ -4,6 +4,7 @@ import streamlit as st
 import pandas as pd
 import os
 from bigquery_utils import query_bigquery
+from search_index import build_search_index, search_events
 
 # --- Page Config ---
 st.set_page_config(
@@ -27,12 +28,13 @@ if data_source == "BigQuery":
 # --- Load Data from BigQuery ---
 @st.cache_data(ttl=300)  # cache for 5 minutes (shorter cache for fresher data)
 def load_data_from_bigquery():
-    """Load data from BigQuery"""
+    """Load data from BigQuery, with the time of the load identifying this copy of the data"""
     try:
         # Query weather data (latest 5 days) - use full project ID
         weather_query = """
         SELECT 
             date,
+            cell_id,
             temperature_celsius,
             feels_like,
             temp_min,
@@ -46,28 +48,58 @@ def load_data_from_bigquery():
             weather_description
         FROM `ds5500-459222.weather_events.weather_forecast`
         WHERE date >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 5 DAY)
+        -- Refreshed forecasts are appended as new versions; keep the latest fetch of each cell and day.
+        -- RANK keeps both rows a fetch stores for today (current weather and the noon forecast)
+        QUALIFY RANK() OVER (PARTITION BY cell_id, date ORDER BY fetched_at DESC) = 1
         ORDER BY date ASC
         """
         
         # Query events data (latest 5 days) - use full project ID
+        # Each run appends changed events as new versions; keep the latest version of each event.
+        # Rows loaded before change detection have no event_id and are only used for older dates.
         events_query = """
+        WITH latest_versions AS (
+            SELECT *
+            FROM `ds5500-459222.weather_events.events_forecast`
+            WHERE event_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 5 DAY)
+            AND (
+                event_id IS NOT NULL
+                OR event_date < (
+                    SELECT IFNULL(MIN(event_date), DATE '9999-12-31')
+                    FROM `ds5500-459222.weather_events.events_forecast`
+                    WHERE event_id IS NOT NULL
+                )
+            )
+            QUALIFY ROW_NUMBER() OVER (
+                PARTITION BY COALESCE(event_id, CONCAT(event_name, '|', CAST(event_date AS STRING), '|', venue, '|', event_time))
+                ORDER BY loaded_at DESC
+            ) = 1
+        )
+        -- Venue attributes live in the venue dimension; legacy rows still carry their own
         SELECT 
-            event_name,
-            event_date,
-            event_time,
-            venue,
-            address,
-            city,
-            price_min,
-            price_max,
-            category,
-            free_or_paid,
-            status,
-            event_url,
-            image_url,
-            recommendation
-        FROM `ds5500-459222.weather_events.events_forecast`
-        WHERE event_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 5 DAY)
+            e.event_name,
+            e.event_date,
+            e.event_time,
+            COALESCE(v.venue, e.venue) AS venue,
+            COALESCE(v.address, e.address) AS address,
+            COALESCE(v.city, e.city) AS city,
+            e.price_min,
+            e.price_max,
+            e.category,
+            e.free_or_paid,
+            e.status,
+            e.event_url,
+            e.image_url,
+            e.recommendation,
+            e.recommendation_confidence
+        FROM latest_versions e
+        LEFT JOIN (
+            -- A changed venue is stored as a new version; join the latest one
+            SELECT *
+            FROM `ds5500-459222.weather_events.venues`
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY venue_id ORDER BY loaded_at DESC) = 1
+        ) v
+        ON v.venue_id = e.venue_id
         ORDER BY event_date ASC, event_time ASC
         """
         
@@ -78,43 +110,81 @@ def load_data_from_bigquery():
         weather_df["date"] = pd.to_datetime(weather_df["date"]).dt.date
         events_df["event_date"] = pd.to_datetime(events_df["event_date"]).dt.date
         
-        return weather_df, events_df, "bigquery"
+        return weather_df, events_df, "bigquery", pd.Timestamp.now()
     except Exception as e:
         st.error(f"Error loading data from BigQuery: {str(e)}")
         st.info("Make sure you have set up BigQuery credentials and the tables exist.")
-        return None, None, "error"
+        return None, None, "error", None
+
+def join_venues(event, venues_path):
+    """Attach venue attributes from the venue dimension CSV"""
+    if "venue" in event.columns:
+        return event
+    venues = pd.read_csv(venues_path)
+    return event.merge(venues, on="venue_id", how="left")
 
 # --- Load Data from CSV ---
 @st.cache_data(ttl=3600)  # cache for 1 hr
 def load_data_from_csv():
-    """Load data from CSV files"""
+    """Load data from CSV files, with the time of the load identifying this copy of the data"""
     # Try to load from local files first (for local development)
     try:
         weather = pd.read_csv("output/weather_forecast.csv")
-        event = pd.read_csv("output/events_forecast.csv")
+        event = join_venues(pd.read_csv("output/events_forecast.csv"), "output/venues.csv")
         weather["date"] = pd.to_datetime(weather["date"]).dt.date
         event["event_date"] = pd.to_datetime(event["event_date"]).dt.date
-        return weather, event, "local"
+        return weather, event, "local", pd.Timestamp.now()
     except FileNotFoundError:
         # If local files don't exist, load from GitHub (for Streamlit Cloud deployment)
         try:
             github_base_url = "https://raw.githubusercontent.com/samantha0820/weather-event-etl/main/output"
             weather = pd.read_csv(f"{github_base_url}/weather_forecast.csv")
-            event = pd.read_csv(f"{github_base_url}/events_forecast.csv")
+            event = join_venues(pd.read_csv(f"{github_base_url}/events_forecast.csv"), f"{github_base_url}/venues.csv")
             weather["date"] = pd.to_datetime(weather["date"]).dt.date
             event["event_date"] = pd.to_datetime(event["event_date"]).dt.date
-            return weather, event, "github"
+            return weather, event, "github", pd.Timestamp.now()
         except Exception as e:
             st.error(f"Error loading data from CSV: {str(e)}")
-            return None, None, "error"
+            return None, None, "error", None
+
+# --- Load Daily Rollups ---
+@st.cache_data(ttl=300)
+def load_rollups(source):
+    """Load the precomputed per-day summaries, or None if they are not available yet"""
+    try:
+        if source == "bigquery":
+            rollups = query_bigquery("""
+            SELECT *
+            FROM `ds5500-459222.weather_events.daily_rollups`
+            WHERE event_date >= CURRENT_DATE()
+            ORDER BY event_date ASC
+            """)
+        elif source == "local":
+            rollups = pd.read_csv("output/daily_rollups.csv")
+        else:
+            rollups = pd.read_csv("https://raw.githubusercontent.com/samantha0820/weather-event-etl/main/output/daily_rollups.csv")
+    except Exception:
+        return None
+    rollups["event_date"] = pd.to_datetime(rollups["event_date"]).dt.date
+    return rollups
+
+# --- Event Search Index ---
+@st.cache_resource(max_entries=4)
+def get_search_index(data_key, _event_df):
+    """
+    Build the event search index once per loaded dataset; shared by all sessions.
+    data_key is the (source, load time) pair of the cached data load, so looking up the
+    index on a rerun costs nothing and a new load rebuilds it.
+    """
+    return build_search_index(_event_df)
 
 # --- Load Data Based on Selection ---
 if data_source == "BigQuery":
-    weather_df, event_df, data_source_name = load_data_from_bigquery()
+    weather_df, event_df, data_source_name, data_loaded_at = load_data_from_bigquery()
     if data_source_name == "error":
         st.stop()
 else:
-    weather_df, event_df, data_source_name = load_data_from_csv()
+    weather_df, event_df, data_source_name, data_loaded_at = load_data_from_csv()
     if data_source_name == "error":
         st.stop()
 
@@ -164,7 +234,32 @@ selected_weather_date = st.selectbox(
     key="weather_select"
 )
 
-selected_weather = weather_df[weather_df["date"] == selected_weather_date].iloc[0]
+def summarize_day_weather(day_df):
+    """
+    Summarize the weather rows of one day across the city's grid cells: readings are averaged
+    and the most common condition is shown. Today's rows include both the current weather and
+    the noon forecast of each cell.
+    """
+    numeric_columns = [
+        "temperature_celsius", "feels_like", "humidity", "pressure",
+        "wind_speed", "cloudiness", "precipitation_chance"
+    ]
+    summary = day_df[numeric_columns].astype(float).mean().round(1)
+    # Rain chance is shown as a percentage, so it keeps its precision
+    summary["precipitation_chance"] = day_df["precipitation_chance"].astype(float).mean()
+    conditions = day_df.groupby(["weather_main", "weather_description"]).size()
+    summary["weather_main"], summary["weather_description"] = (
+        conditions.idxmax() if not conditions.empty else ("Unknown", "no condition reported")
+    )
+    return summary
+
+day_weather = weather_df[weather_df["date"] == selected_weather_date]
+selected_weather = summarize_day_weather(day_weather)
+cell_count = day_weather["cell_id"].nunique() if "cell_id" in day_weather.columns else 1
+st.caption(
+    f"Averaged over {cell_count} area(s) of the city with events"
+    + (", current conditions and the noon forecast" if selected_weather_date == pd.Timestamp("today").date() else ", noon forecast")
+)
 
 col1, col2, col3 = st.columns(3)
 with col1:
@@ -181,6 +276,22 @@ st.write(f"**Weather:** {selected_weather['weather_main']} - {selected_weather['
 
 st.divider()
 
+# --- Event Summary Section ---
+rollups_df = load_rollups(data_source_name)
+if rollups_df is not None and not rollups_df.empty:
+    st.header("Event Summary")
+    daily = rollups_df.groupby("event_date").agg(
+        events=("event_count", "sum"),
+        paid=("paid_count", "sum"),
+        free=("free_count", "sum"),
+        median_min_price=("price_min_p50", "median"),
+    )
+    st.bar_chart(rollups_df.pivot_table(
+        index="event_date", columns="recommendation", values="event_count", aggfunc="sum", fill_value=0
+    ))
+    st.dataframe(daily, use_container_width=True)
+    st.divider()
+
 # --- Events Section ---
 st.header("5-Day Events")
 
@@ -191,20 +302,30 @@ elif hasattr(event_df["event_date"].iloc[0], 'date'):
     event_df["event_date"] = event_df["event_date"].dt.date
 available_dates = sorted(event_df["event_date"].unique())
 
-selected_date = st.selectbox("Select a Date for Events:", available_dates)
+search_query = st.text_input("Search events, venues or categories:", placeholder="e.g. jazz garden")
+selected_date = st.selectbox("Select a Date for Events:", available_dates, disabled=bool(search_query.strip()))
 recommendation_filter = st.selectbox(
     "Filter by Recommendation:",
     ["All", "Recommended (Indoor)", "Recommended (Outdoor)", "Recommended (Indoor OK)", "Not Recommended (Outdoor)"]
 )
 
-filtered_df = event_df[event_df["event_date"] == selected_date]
+if search_query.strip():
+    # Searches cover every loaded date
+    event_df = event_df.reset_index(drop=True)
+    search_index = get_search_index((data_source_name, data_loaded_at), event_df)
+    filtered_df = event_df.iloc[search_events(search_index, search_query)]
+else:
+    filtered_df = event_df[event_df["event_date"] == selected_date]
 
 if recommendation_filter != "All":
     filtered_df = filtered_df[filtered_df["recommendation"] == recommendation_filter]
 
-filtered_df = filtered_df.sort_values(by="event_time")
-
-st.subheader(f"Events on {selected_date.strftime('%B %d, %Y')}")
+if search_query.strip():
+    filtered_df = filtered_df.sort_values(by=["event_date", "event_time"])
+    st.subheader(f"{len(filtered_df)} events matching \"{search_query.strip()}\"")
+else:
+    filtered_df = filtered_df.sort_values(by="event_time")
+    st.subheader(f"Events on {selected_date.strftime('%B %d, %Y')}")
 
 if filtered_df.empty:
     st.info("No events available for this date.")
@@ -220,13 +341,20 @@ else:
             with detail_col:
                 st.markdown(f"### [{row['event_name']}]({row['event_url']})")
                 st.write(f"**Venue:** {row['venue']}, {row['city']}")
-                st.write(f"**Time:** {row['event_time']}")
+                if search_query.strip():
+                    st.write(f"**Time:** {row['event_date'].strftime('%B %d, %Y')} {row['event_time']}")
+                else:
+                    st.write(f"**Time:** {row['event_time']}")
                 price_text = (
                     f"${row['price_min']:.2f} - ${row['price_max']:.2f}"
                     if pd.notna(row['price_min']) and pd.notna(row['price_max']) else "N/A"
                 )
                 st.write(f"**Price:** {price_text}")
-                st.write(f"**Recommendation:** {row['recommendation']}")
+                confidence = row.get("recommendation_confidence")
+                if pd.notna(confidence):
+                    st.write(f"**Recommendation:** {row['recommendation']} ({confidence:.0%} of the day's weather range agrees)")
+                else:
+                    st.write(f"**Recommendation:** {row['recommendation']}")
             st.divider()
 
 # --- Footer ---
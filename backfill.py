@@ -0,0 +1,201 @@
+# backfill.py
+import argparse
+import glob
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from bigquery_utils import (
+    get_bigquery_client,
+    get_table_schemas,
+    ensure_dataset_and_tables,
+    load_dataframe,
+    bump_load_generation,
+)
+from load import venue_attributes_hash
+
+ARCHIVE_DIR = "output/archive"
+CHECKPOINT_PATH = "output/backfill_checkpoint.json"
+
+# Table id -> (archived file suffix, date column used for partitioning).
+# The venue dimension has no date and is loaded as a single batch keyed by venue_id.
+BACKFILL_TABLES = {
+    "weather_forecast": ("weather_forecast.csv", "date"),
+    "events_forecast": ("events_forecast.csv", "event_date"),
+    "venues": ("venues.csv", None),
+}
+
+
+def list_archived_files(start_date, end_date, suffix, archive_dir=ARCHIVE_DIR):
+    """
+    Return (run_time, path) for every archived file of one table with a run date in [start_date, end_date].
+    """
+    files = []
+    for path in glob.glob(os.path.join(archive_dir, "*", f"*_{suffix}")):
+        run_date = os.path.basename(os.path.dirname(path))
+        run_clock = os.path.basename(path).split("_", 1)[0]
+        try:
+            run_time = pd.to_datetime(f"{run_date} {run_clock}", format="%Y-%m-%d %H%M%S", utc=True)
+        except ValueError:
+            continue
+        if start_date <= run_time.date() <= end_date:
+            files.append((run_time, path))
+    return sorted(files)
+
+
+def read_archived_table(table_id, files):
+    """
+    Concatenate the archived outputs of one table, keeping the latest run's row where runs overlap.
+    """
+    frames = []
+    for run_time, path in files:
+        try:
+            df = pd.read_csv(path)
+        except pd.errors.EmptyDataError:
+            continue
+        if not df.empty:
+            frames.append(df.assign(run_time=run_time))
+    if not frames:
+        return pd.DataFrame()
+
+    df = pd.concat(frames, ignore_index=True)
+    if table_id == "weather_forecast":
+        # Later runs overwrite the forecast of the same cell and day; runs archived before
+        # fetched_at existed are versioned by their run time
+        df["date"] = pd.to_datetime(df["date"])
+        fetched_at = pd.to_datetime(df["fetched_at"], utc=True) if "fetched_at" in df.columns else df["run_time"]
+        df["fetched_at"] = fetched_at.fillna(df["run_time"])
+        df = df.drop_duplicates(subset=["cell_id", "date"], keep="last")
+    elif table_id == "venues":
+        # The latest archived version of each venue; loads compare it with the latest stored one
+        df = df.drop_duplicates(subset=["venue_id"], keep="last")
+        attributes_hash = venue_attributes_hash(df)
+        df["attributes_hash"] = df["attributes_hash"].fillna(attributes_hash) if "attributes_hash" in df.columns else attributes_hash
+        loaded_at = pd.to_datetime(df["loaded_at"], utc=True, format="ISO8601") if "loaded_at" in df.columns else df["run_time"]
+        df["loaded_at"] = loaded_at.fillna(df["run_time"])
+    else:
+        # Every archived event delta is a version of its event. The archive keeps the loaded_at
+        # the run sent to BigQuery, so the row keys match the rows it loaded; deltas archived
+        # without it are stamped with their run time
+        df["event_date"] = pd.to_datetime(df["event_date"]).dt.date
+        loaded_at = pd.to_datetime(df["loaded_at"], utc=True, format="ISO8601") if "loaded_at" in df.columns else df["run_time"]
+        df["loaded_at"] = loaded_at.fillna(df["run_time"])
+    return df.drop(columns=["run_time"])
+
+
+def partition_key(df, date_column):
+    """
+    Group rows by month of their date so each load job carries a large batch.
+    """
+    if date_column is None:
+        return pd.Series("all", index=df.index)
+    return pd.to_datetime(df[date_column]).dt.strftime("%Y-%m")
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    try:
+        with open(path, "r") as f:
+            return set(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return set()
+
+
+def save_checkpoint(done, path=CHECKPOINT_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(sorted(done), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_backfill(start_date, end_date, dataset_id="weather_events", max_workers=4,
+                 archive_dir=ARCHIVE_DIR, checkpoint_path=CHECKPOINT_PATH, skip_existing=True):
+    """
+    Load archived run outputs for a date range into BigQuery.
+
+    Archived runs are grouped into one load job per table and month, and the jobs
+    run concurrently. Finished jobs are recorded in a checkpoint file, so an
+    interrupted backfill resumes where it stopped.
+
+    Args:
+        start_date: first archived run date to load
+        end_date: last archived run date to load
+        dataset_id: ID of the BigQuery dataset
+        max_workers: number of load jobs running at once
+        skip_existing: drop rows that are already in the table, the same rule
+                       update_bigquery_data applies
+    """
+    client = get_bigquery_client()
+    ensure_dataset_and_tables(client, dataset_id)
+    schemas = get_table_schemas()
+    done = load_checkpoint(checkpoint_path)
+    done_lock = threading.Lock()
+
+    jobs = []
+    for table_id, (suffix, date_column) in BACKFILL_TABLES.items():
+        files = list_archived_files(start_date, end_date, suffix, archive_dir)
+        df = read_archived_table(table_id, files)
+        print(f"📦 {table_id}: {len(files)} archived run(s), {len(df)} row(s)")
+        if df.empty:
+            continue
+
+        schema_columns = [field.name for field in schemas[table_id]]
+        df = df[[column for column in schema_columns if column in df.columns]]
+        for month, part in df.groupby(partition_key(df, date_column)):
+            key = f"{start_date}..{end_date}:{table_id}:{month}"
+            if key in done:
+                print(f"   ⏭️  {key} already loaded")
+                continue
+            jobs.append((key, table_id, part.reset_index(drop=True)))
+
+    def run_job(job):
+        key, table_id, part = job
+        # Each job skips the rows already loaded, e.g. by an earlier run that stopped before
+        # its checkpoint was saved, but still loads a new weather cell on a loaded date
+        rows = load_dataframe(client, part, table_id, schemas[table_id], dataset_id, skip_loaded=skip_existing)
+        with done_lock:
+            done.add(key)
+            save_checkpoint(done, checkpoint_path)
+        return key, rows
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_job, job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                key, rows = future.result()
+                print(f"✅ Loaded {rows} row(s) for {key}")
+            except Exception as e:
+                failures.append(futures[future])
+                print(f"❌ Load failed for {futures[future]}: {str(e)}")
+
+    if len(failures) < len(jobs):
+        # Cached dashboard queries must see the backfilled rows
+        bump_load_generation(client, dataset_id)
+    if failures:
+        raise Exception(f"Backfill incomplete, rerun to resume: {', '.join(sorted(failures))}")
+    print(f"Backfill finished: {len(jobs)} load job(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load archived ETL outputs into BigQuery")
+    parser.add_argument("start_date", type=lambda d: pd.to_datetime(d).date())
+    parser.add_argument("end_date", type=lambda d: pd.to_datetime(d).date())
+    parser.add_argument("--dataset", default="weather_events")
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--include-existing", action="store_true",
+                        help="Also load rows that are already in BigQuery")
+    args = parser.parse_args()
+
+    run_backfill(
+        args.start_date,
+        args.end_date,
+        dataset_id=args.dataset,
+        max_workers=args.max_workers,
+        archive_dir=args.archive_dir,
+        skip_existing=not args.include_existing,
+    )
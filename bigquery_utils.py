@@ -1,13 +1,31 @@
 from google.cloud import bigquery
 from google.api_core.exceptions import NotFound
 import pandas as pd
+import pyarrow as pa
 import os
+import re
+import time
+import hashlib
 from dotenv import load_dotenv
 import json
+from bq_storage_write import write_dataframe
+from load import venue_attributes_hash
 
 # Load environment variables from .env file
 load_dotenv()
 
+# How appends reach BigQuery: "load_job" (batch load jobs) or "storage_write" (Storage Write API streams)
+BQ_WRITE_METHOD = os.getenv("BQ_WRITE_METHOD", "load_job")
+
+# Query results cached on disk as Arrow files, shared by every process on the machine
+QUERY_CACHE_DIR = os.getenv("BQ_QUERY_CACHE_DIR", "output/query_cache")
+
+# Entries older than this are refreshed even without a new load, as a safety net
+QUERY_CACHE_MAX_AGE = 6 * 3600
+
+# Dataset label holding the load generation; every successful load changes it
+GENERATION_LABEL = "load_generation"
+
 def get_bigquery_client():
     """
     Create and return a BigQuery client.
@@ -122,6 +140,10 @@ def get_weather_schema():
         bigquery.SchemaField("precipitation_chance", "FLOAT64"),
         bigquery.SchemaField("weather_main", "STRING"),
         bigquery.SchemaField("weather_description", "STRING"),
+        bigquery.SchemaField("cell_id", "STRING"),
+        bigquery.SchemaField("latitude", "FLOAT64"),
+        bigquery.SchemaField("longitude", "FLOAT64"),
+        bigquery.SchemaField("fetched_at", "TIMESTAMP"),
     ]
 
 def get_events_schema():
@@ -129,12 +151,17 @@ def get_events_schema():
     Returns the schema for the events data table.
     """
     return [
+        bigquery.SchemaField("event_id", "STRING"),
         bigquery.SchemaField("event_name", "STRING"),
         bigquery.SchemaField("event_date", "DATE"),
         bigquery.SchemaField("event_time", "STRING"),
+        bigquery.SchemaField("venue_id", "STRING"),
         bigquery.SchemaField("venue", "STRING"),
         bigquery.SchemaField("address", "STRING"),
         bigquery.SchemaField("city", "STRING"),
+        bigquery.SchemaField("latitude", "FLOAT64"),
+        bigquery.SchemaField("longitude", "FLOAT64"),
+        bigquery.SchemaField("cell_id", "STRING"),
         bigquery.SchemaField("price_min", "FLOAT64"),
         bigquery.SchemaField("price_max", "FLOAT64"),
         bigquery.SchemaField("category", "STRING"),
@@ -143,21 +170,69 @@ def get_events_schema():
         bigquery.SchemaField("event_url", "STRING"),
         bigquery.SchemaField("image_url", "STRING"),
         bigquery.SchemaField("recommendation", "STRING"),
+        bigquery.SchemaField("recommendation_confidence", "FLOAT64"),
+        bigquery.SchemaField("change_type", "STRING"),
+        bigquery.SchemaField("loaded_at", "TIMESTAMP"),
     ]
 
-def update_bigquery_data(weather_df: pd.DataFrame, event_df: pd.DataFrame, dataset_id: str = "weather_events"):
+def get_venues_schema():
     """
-    Update BigQuery tables with new data. This function will:
-    1. Create the dataset and tables if they don't exist
-    2. Append new data to the existing tables
-    
-    Args:
-        weather_df: DataFrame containing weather data
-        event_df: DataFrame containing event data
-        dataset_id: ID of the BigQuery dataset
+    Returns the schema for the venue dimension table.
     """
-    client = get_bigquery_client()
+    return [
+        bigquery.SchemaField("venue_id", "STRING"),
+        bigquery.SchemaField("venue", "STRING"),
+        bigquery.SchemaField("address", "STRING"),
+        bigquery.SchemaField("city", "STRING"),
+        bigquery.SchemaField("latitude", "FLOAT64"),
+        bigquery.SchemaField("longitude", "FLOAT64"),
+        # A changed venue is appended as a new version; readers keep the latest per venue_id
+        bigquery.SchemaField("attributes_hash", "STRING"),
+        bigquery.SchemaField("loaded_at", "TIMESTAMP"),
+    ]
+
+def get_rollups_schema():
+    """
+    Returns the schema for the daily rollups table.
+    """
+    return [
+        bigquery.SchemaField("event_date", "DATE"),
+        bigquery.SchemaField("category", "STRING"),
+        bigquery.SchemaField("recommendation", "STRING"),
+        bigquery.SchemaField("event_count", "INT64"),
+        bigquery.SchemaField("paid_count", "INT64"),
+        bigquery.SchemaField("free_count", "INT64"),
+        bigquery.SchemaField("priced_count", "INT64"),
+        bigquery.SchemaField("price_min_avg", "FLOAT64"),
+        bigquery.SchemaField("price_min_p25", "FLOAT64"),
+        bigquery.SchemaField("price_min_p50", "FLOAT64"),
+        bigquery.SchemaField("price_min_p75", "FLOAT64"),
+        bigquery.SchemaField("price_max_max", "FLOAT64"),
+    ]
+
+# Tables partitioned by day on a DATE column, so single days can be replaced
+TABLE_PARTITION_FIELDS = {
+    "daily_rollups": "event_date",
+}
+
+def get_table_schemas():
+    """
+    Returns the table id -> schema mapping of every table in the dataset.
+    """
+    return {
+        "weather_forecast": get_weather_schema(),
+        "events_forecast": get_events_schema(),
+        "venues": get_venues_schema(),
+        "daily_rollups": get_rollups_schema(),
+    }
+
+def ensure_dataset_and_tables(client, dataset_id: str = "weather_events"):
+    """
+    Create the dataset and its tables if they don't exist.
     
+    Returns:
+        Reference to the dataset
+    """
     # Create dataset if it doesn't exist
     try:
         dataset_ref = client.dataset(dataset_id)
@@ -165,158 +240,429 @@ def update_bigquery_data(weather_df: pd.DataFrame, event_df: pd.DataFrame, datas
     except NotFound:
         dataset = bigquery.Dataset(dataset_ref)
         dataset.location = "US"
-        client.create_dataset(dataset)
+        # Concurrent loads may race to create it; exists_ok tolerates the loser
+        client.create_dataset(dataset, exists_ok=True)
         print(f"Created dataset {dataset_id}")
     
     # Create tables if they don't exist
-    for table_id, schema in [
-        ("weather_forecast", get_weather_schema()),
-        ("events_forecast", get_events_schema())
-    ]:
+    for table_id, schema in get_table_schemas().items():
         table_ref = dataset_ref.table(table_id)
         try:
-            client.get_table(table_ref)
+            # Existing tables get columns added to the schema since, so dedup queries can read them
+            add_missing_columns(client, table_id, schema, dataset_id)
         except NotFound:
             table = bigquery.Table(table_ref, schema=schema)
-            client.create_table(table)
+            if table_id in TABLE_PARTITION_FIELDS:
+                table.time_partitioning = bigquery.TimePartitioning(
+                    type_=bigquery.TimePartitioningType.DAY,
+                    field=TABLE_PARTITION_FIELDS[table_id],
+                )
+            client.create_table(table, exists_ok=True)
             print(f"Created table {dataset_id}.{table_id}")
+    return dataset_ref
+
+def add_missing_columns(client, table_id: str, schema, dataset_id: str = "weather_events"):
+    """
+    Add schema fields missing from an existing table. Load jobs do this themselves
+    with ALLOW_FIELD_ADDITION; Storage Write API streams need the columns beforehand.
+    """
+    table = client.get_table(f"{dataset_id}.{table_id}")
+    existing = {field.name for field in table.schema}
+    missing = [field for field in schema if field.name not in existing]
+    if missing:
+        table.schema = list(table.schema) + missing
+        client.update_table(table, ["schema"])
+        print(f"   Added column(s) {[field.name for field in missing]} to {dataset_id}.{table_id}")
+
+def load_dataframe(client, df: pd.DataFrame, table_id: str, schema, dataset_id: str = "weather_events",
+                   skip_loaded: bool = True):
+    """
+    Append a DataFrame to a table and wait for it to finish, with a load job or,
+    when BQ_WRITE_METHOD is "storage_write", through Storage Write API streams.
+
+    Rows of a TABLE_ROW_KEYS table whose key is already in the table, and venues whose
+    latest stored version has the same attributes, are dropped first, whichever write
+    method is used, so a retried load does not write them twice.
+
+    Args:
+        skip_loaded: drop the rows that are already loaded; off to append every row
+
+    Returns:
+        Number of rows written
+    """
+    if skip_loaded and table_id in TABLE_ROW_KEYS and set(TABLE_ROW_KEYS[table_id]) <= set(df.columns):
+        df = drop_loaded_rows(client, df, table_id, dataset_id)
+    elif skip_loaded and table_id == "venues":
+        df = drop_unchanged_venues(client, df, dataset_id)
+    if df.empty:
+        print(f"   ⚠️  No new rows to write to {dataset_id}.{table_id}")
+        return 0
+
+    if BQ_WRITE_METHOD == "storage_write":
+        add_missing_columns(client, table_id, schema, dataset_id)
+        return write_dataframe(df, table_id, schema, dataset_id, project=client.project)
+
+    job_config = bigquery.LoadJobConfig(
+        schema=schema,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        # Tables created before a column was added to the schema pick it up on load
+        schema_update_options=[bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION],
+    )
+    
+    job = client.load_table_from_dataframe(
+        df, 
+        f"{dataset_id}.{table_id}", 
+        job_config=job_config
+    )
+    job.result()  # Wait for the job to complete
+    return len(df)
+
+def existing_dates(client, table_id: str, date_column: str, dates, dataset_id: str = "weather_events"):
+    """
+    Return the subset of dates that already have rows in a table, in one query.
+    """
+    if not dates:
+        return set()
+    date_list = ', '.join([f"DATE('{d}')" for d in sorted(dates)])
+    existing_query = f"""
+    SELECT DISTINCT DATE({date_column}) as date
+    FROM `{dataset_id}.{table_id}`
+    WHERE DATE({date_column}) IN ({date_list})
+    """
+    existing_df = client.query(existing_query).result().to_dataframe()
+    return set(pd.to_datetime(existing_df['date']).dt.date.unique())
+
+# Columns identifying a row; rows whose key is already in the table are not appended again
+TABLE_ROW_KEYS = {
+    "weather_forecast": ["cell_id", "date", "fetched_at"],
+    "events_forecast": ["event_id", "event_name", "event_date", "loaded_at"],
+}
+
+def _key_part_sql(field):
+    # Rendered the same way as in row_keys: timestamps as epoch microseconds, NULL as ''
+    if field.field_type == "TIMESTAMP":
+        return f"IFNULL(CAST(UNIX_MICROS({field.name}) AS STRING), '')"
+    return f"IFNULL(CAST({field.name} AS STRING), '')"
+
+def row_keys(df: pd.DataFrame, table_id: str):
+    """
+    Return the TABLE_ROW_KEYS key of every row as a string Series, matching existing_row_keys.
+    """
+    field_types = {field.name: field.field_type for field in get_table_schemas()[table_id]}
+    key = None
+    for column in TABLE_ROW_KEYS[table_id]:
+        values = df[column]
+        if field_types[column] == "TIMESTAMP":
+            stamps = pd.to_datetime(values, utc=True)
+            part = (stamps.astype("int64") // 1000).astype(str).where(stamps.notna(), "")
+        elif field_types[column] == "DATE":
+            part = pd.to_datetime(values).dt.strftime("%Y-%m-%d").fillna("")
+        else:
+            part = values.astype("string").fillna("")
+        key = part if key is None else key + "|" + part
+    return key.astype(str)
+
+def existing_row_keys(client, table_id: str, keys, dataset_id: str = "weather_events"):
+    """
+    Return the subset of row keys (see row_keys) that already have rows in a table, in one query.
+    """
+    if not keys:
+        return set()
+    fields = {field.name: field for field in get_table_schemas()[table_id]}
+    key_sql = ", '|', ".join(_key_part_sql(fields[column]) for column in TABLE_ROW_KEYS[table_id])
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ArrayQueryParameter("keys", "STRING", sorted(keys))]
+    )
+    existing_query = f"""
+    SELECT DISTINCT key
+    FROM (SELECT CONCAT({key_sql}) AS key FROM `{dataset_id}.{table_id}`)
+    WHERE key IN UNNEST(@keys)
+    """
+    existing_df = client.query(existing_query, job_config=job_config).result().to_dataframe()
+    return set(existing_df['key'])
+
+def drop_loaded_rows(client, df: pd.DataFrame, table_id: str, dataset_id: str = "weather_events"):
+    """
+    Drop the rows of df whose TABLE_ROW_KEYS key is already in the table.
+    """
+    keys = row_keys(df, table_id)
+    print(f"   🔍 Checking {keys.nunique()} {'/'.join(TABLE_ROW_KEYS[table_id])} key(s) against {table_id}...")
+    loaded = existing_row_keys(client, table_id, set(keys), dataset_id)
+    if loaded:
+        df = df[~keys.isin(loaded).to_numpy()]
+        print(f"   ✅ Filtered out {len(loaded)} key(s) already loaded, {len(df)} new row(s) to insert")
+    return df
+
+def latest_venue_hashes(client, venue_ids, dataset_id: str = "weather_events"):
+    """
+    Return venue_id -> attributes_hash of the latest stored version of each venue, in one query.
+    """
+    if not venue_ids:
+        return {}
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ArrayQueryParameter("venue_ids", "STRING", sorted(venue_ids))]
+    )
+    latest_query = f"""
+    SELECT venue_id, attributes_hash
+    FROM `{dataset_id}.venues`
+    WHERE venue_id IN UNNEST(@venue_ids)
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY venue_id ORDER BY loaded_at DESC) = 1
+    """
+    latest_df = client.query(latest_query, job_config=job_config).result().to_dataframe()
+    return dict(zip(latest_df["venue_id"], latest_df["attributes_hash"]))
+
+def drop_unchanged_venues(client, df: pd.DataFrame, dataset_id: str = "weather_events"):
+    """
+    Drop the venues whose latest stored version has the same attributes. New and changed
+    venues are kept and appended as new versions.
+    """
+    latest = latest_venue_hashes(client, set(df["venue_id"]), dataset_id)
+    unchanged = df["venue_id"].map(latest) == df["attributes_hash"]
+    if unchanged.any():
+        df = df[~unchanged.to_numpy()]
+        print(f"   ✅ {int(unchanged.sum())} venue(s) unchanged, {len(df)} new or changed venue(s) to insert")
+    return df
+
+def update_bigquery_table(df: pd.DataFrame, table_id: str, dataset_id: str = "weather_events", client=None):
+    """
+    Append new rows to one table, skipping rows that are already loaded.
+    
+    Args:
+        df: DataFrame to load
+        table_id: "weather_forecast", "events_forecast" or "venues"
+        dataset_id: ID of the BigQuery dataset
+        client: BigQuery client to reuse; a new one is created if omitted
+
+    Returns:
+        Number of rows inserted. The caller bumps the load generation once all of its
+        loads are done
+    """
+    if client is None:
+        client = get_bigquery_client()
+        ensure_dataset_and_tables(client, dataset_id)
+    schema = get_table_schemas()[table_id]
     
-    # Update data - delete existing records for the same dates first to avoid duplicates
-    for df, table_id, schema in [
-        (weather_df, "weather_forecast", get_weather_schema()),
-        (event_df, "events_forecast", get_events_schema())
-    ]:
+    if df.empty:
+        print(f"⚠️  {table_id} DataFrame is empty, skipping update")
+        return 0
+        
+    print(f"📊 Updating {table_id} with {len(df)} rows...")
+    print(f"   Columns: {list(df.columns)}")
+    
+    try:
+        # Step 1: Filter out duplicates by checking existing data in BigQuery
+        # This avoids DML queries which require billing. Weather rows (per grid cell and
+        # fetch) and event deltas are filtered by their TABLE_ROW_KEYS key in load_dataframe:
+        # a new cell or a refreshed forecast for a loaded date is still inserted, a retried
+        # load of the same rows is not. Venues are filtered against their latest version there
+        if table_id == "venues":
+            # A venue whose attributes changed is appended as a new version; readers keep
+            # the latest version of each venue_id
+            if "attributes_hash" not in df.columns:
+                df = df.assign(attributes_hash=venue_attributes_hash(df))
+            if "loaded_at" not in df.columns:
+                df = df.assign(loaded_at=pd.Timestamp.now(tz="UTC"))
+
+        elif table_id == "events_forecast" and "change_type" in df.columns:
+            # Event deltas are already deduplicated against previous runs by the
+            # fingerprint index; append them as new versions of their events.
+            # Callers stamp loaded_at once per run, so a retried load skips the rows it already wrote
+            if "loaded_at" not in df.columns:
+                df = df.assign(loaded_at=pd.Timestamp.now(tz="UTC"))
+            print(f"   🔁 Appending event delta: {df['change_type'].value_counts().to_dict()}")
+
+        elif table_id == "events_forecast":
+            # Full event snapshots skip the dates that are already loaded
+            event_dates = pd.to_datetime(df["event_date"]).dt.date
+            new_dates = set(event_dates.unique())
+            print(f"   🔍 Checking for existing records for {len(new_dates)} date(s)...")
+            loaded_dates = existing_dates(client, table_id, "event_date", new_dates, dataset_id)
+            if loaded_dates:
+                df = df[~event_dates.isin(loaded_dates)]
+                print(f"   ✅ Filtered out {len(loaded_dates)} duplicate date(s), {len(new_dates) - len(loaded_dates)} new date(s) to insert")
+
+        # Step 2: Insert new data (only non-duplicates)
         if df.empty:
-            print(f"⚠️  {table_id} DataFrame is empty, skipping update")
-            continue
-            
-        print(f"📊 Updating {table_id} with {len(df)} rows...")
-        print(f"   Columns: {list(df.columns)}")
+            print(f"   ⚠️  No new data to insert after filtering duplicates")
+            return 0
+        inserted = load_dataframe(client, df, table_id, schema, dataset_id)
+        if inserted == 0:
+            return 0
+        
+        # Verify the update
+        table = client.get_table(f"{dataset_id}.{table_id}")
+        print(f"✅ Inserted {inserted} new row(s) into {dataset_id}.{table_id}")
+        print(f"   Total rows in table: {table.num_rows}")
+        return inserted
         
+    except Exception as e:
+        error_msg = f"❌ Error updating {dataset_id}.{table_id}: {str(e)}"
+        print(error_msg)
+        import traceback
+        traceback.print_exc()
+        raise Exception(error_msg) from e
+
+def replace_rollup_partitions(rollups_df: pd.DataFrame, dates, dataset_id: str = "weather_events", client=None):
+    """
+    Overwrite the daily_rollups partitions of the given dates with freshly computed rows.
+    Dates without rows are emptied. Other partitions are left untouched.
+    
+    Args:
+        rollups_df: rollup rows of the given dates
+        dates: event dates whose rollups were recomputed
+        dataset_id: ID of the BigQuery dataset
+        client: BigQuery client to reuse; a new one is created if omitted
+
+    Returns:
+        Number of partitions replaced
+    """
+    if not dates:
+        print("⚠️  No rollup partitions to refresh")
+        return 0
+    if client is None:
+        client = get_bigquery_client()
+        ensure_dataset_and_tables(client, dataset_id)
+    
+    schema = get_rollups_schema()
+    rollup_dates = pd.to_datetime(rollups_df["event_date"]).dt.date if not rollups_df.empty else pd.Series(dtype=object)
+    for day in sorted(dates):
+        part = rollups_df[rollup_dates == day] if not rollups_df.empty else rollups_df
+        job_config = bigquery.LoadJobConfig(
+            schema=schema,
+            # Truncating a partition decorator replaces just that day
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        )
+        client.load_table_from_dataframe(
+            part,
+            f"{dataset_id}.daily_rollups${day:%Y%m%d}",
+            job_config=job_config
+        ).result()
+    print(f"✅ Refreshed {len(dates)} rollup partition(s) in {dataset_id}.daily_rollups")
+    return len(dates)
+
+def update_bigquery_data(weather_df: pd.DataFrame, event_df: pd.DataFrame, dataset_id: str = "weather_events"):
+    """
+    Update BigQuery tables with new data. This function will:
+    1. Create the dataset and tables if they don't exist
+    2. Append new data to the existing tables
+    3. Bump the load generation once after both loads, invalidating cached query results
+    
+    Args:
+        weather_df: DataFrame containing weather data
+        event_df: DataFrame containing event data
+        dataset_id: ID of the BigQuery dataset
+    """
+    client = get_bigquery_client()
+    ensure_dataset_and_tables(client, dataset_id)
+    
+    # Update data - skip dates that already exist to avoid duplicates
+    inserted = update_bigquery_table(weather_df, "weather_forecast", dataset_id, client)
+    inserted += update_bigquery_table(event_df, "events_forecast", dataset_id, client)
+    if inserted:
+        bump_load_generation(client, dataset_id)
+
+def get_load_generation(client, dataset_id: str = "weather_events"):
+    """
+    Return the current load generation of a dataset, or None if it has never been bumped.
+    """
+    return client.get_dataset(dataset_id).labels.get(GENERATION_LABEL)
+
+def bump_load_generation(client, dataset_id: str = "weather_events", attempts: int = 3):
+    """
+    Mark the dataset as changed so cached query results are recomputed.
+    A failed bump is only reported: QUERY_CACHE_MAX_AGE still bounds staleness.
+    """
+    for attempt in range(1, attempts + 1):
         try:
-            # Step 1: Filter out duplicates by checking existing data in BigQuery
-            # This avoids DML queries which require billing
-            if table_id == "weather_forecast":
-                # For weather data, filter by date
-                if 'date' in df.columns:
-                    # Get unique dates from new data
-                    if pd.api.types.is_datetime64_any_dtype(df['date']):
-                        new_dates = set(df['date'].dt.date.unique())
-                    else:
-                        new_dates = set(pd.to_datetime(df['date']).dt.date.unique())
-                    
-                    if len(new_dates) > 0:
-                        # Query existing dates from BigQuery
-                        date_list = ', '.join([f"DATE('{d}')" for d in sorted(new_dates)])
-                        existing_query = f"""
-                        SELECT DISTINCT DATE(date) as date
-                        FROM `{dataset_id}.{table_id}`
-                        WHERE DATE(date) IN ({date_list})
-                        """
-                        print(f"   🔍 Checking for existing records for {len(new_dates)} date(s)...")
-                        existing_df = client.query(existing_query).result().to_dataframe()
-                        
-                        if not existing_df.empty:
-                            # Convert existing dates to date objects
-                            if pd.api.types.is_datetime64_any_dtype(existing_df['date']):
-                                existing_dates = set(existing_df['date'].dt.date.unique())
-                            else:
-                                existing_dates = set(pd.to_datetime(existing_df['date']).dt.date.unique())
-                            
-                            # Filter out rows with dates that already exist
-                            if pd.api.types.is_datetime64_any_dtype(df['date']):
-                                df = df[~df['date'].dt.date.isin(existing_dates)]
-                            else:
-                                df = df[~pd.to_datetime(df['date']).dt.date.isin(existing_dates)]
-                            
-                            filtered_count = len(new_dates) - len(existing_dates)
-                            if filtered_count > 0:
-                                print(f"   ✅ Filtered out {len(existing_dates)} duplicate date(s), {filtered_count} new date(s) to insert")
-                            else:
-                                print(f"   ⚠️  All {len(new_dates)} date(s) already exist, skipping insert")
-                                continue
-            
-            elif table_id == "events_forecast":
-                # For events data, filter by event_date
-                if 'event_date' in df.columns:
-                    # Get unique dates from new data
-                    if pd.api.types.is_datetime64_any_dtype(df['event_date']):
-                        new_dates = set(df['event_date'].dt.date.unique())
-                    else:
-                        new_dates = set(pd.to_datetime(df['event_date']).dt.date.unique())
-                    
-                    if len(new_dates) > 0:
-                        # Query existing dates from BigQuery
-                        date_list = ', '.join([f"DATE('{d}')" for d in sorted(new_dates)])
-                        existing_query = f"""
-                        SELECT DISTINCT event_date
-                        FROM `{dataset_id}.{table_id}`
-                        WHERE event_date IN ({date_list})
-                        """
-                        print(f"   🔍 Checking for existing records for {len(new_dates)} date(s)...")
-                        existing_df = client.query(existing_query).result().to_dataframe()
-                        
-                        if not existing_df.empty:
-                            # Convert existing dates to date objects
-                            if pd.api.types.is_datetime64_any_dtype(existing_df['event_date']):
-                                existing_dates = set(existing_df['event_date'].dt.date.unique())
-                            else:
-                                existing_dates = set(pd.to_datetime(existing_df['event_date']).dt.date.unique())
-                            
-                            # Filter out rows with dates that already exist
-                            if pd.api.types.is_datetime64_any_dtype(df['event_date']):
-                                df = df[~df['event_date'].dt.date.isin(existing_dates)]
-                            else:
-                                df = df[~pd.to_datetime(df['event_date']).dt.date.isin(existing_dates)]
-                            
-                            filtered_count = len(new_dates) - len(existing_dates)
-                            if filtered_count > 0:
-                                print(f"   ✅ Filtered out {len(existing_dates)} duplicate date(s), {filtered_count} new date(s) to insert")
-                            else:
-                                print(f"   ⚠️  All {len(new_dates)} date(s) already exist, skipping insert")
-                                continue
-            
-            # Step 2: Insert new data (only non-duplicates)
-            if df.empty:
-                print(f"   ⚠️  No new data to insert after filtering duplicates")
-                continue
-            job_config = bigquery.LoadJobConfig(
-                schema=schema,
-                write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
-            )
-            
-            job = client.load_table_from_dataframe(
-                df, 
-                f"{dataset_id}.{table_id}", 
-                job_config=job_config
-            )
-            job.result()  # Wait for the job to complete
-            
-            # Verify the update
-            table = client.get_table(f"{dataset_id}.{table_id}")
-            print(f"✅ Inserted {len(df)} new row(s) into {dataset_id}.{table_id}")
-            print(f"   Total rows in table: {table.num_rows}")
-            
+            dataset = client.get_dataset(dataset_id)
+            # Label values allow digits only in this form; microseconds keep concurrent bumps distinct
+            dataset.labels = {**dataset.labels, GENERATION_LABEL: str(time.time_ns() // 1000)}
+            client.update_dataset(dataset, ["labels"])
+            return
         except Exception as e:
-            error_msg = f"❌ Error updating {dataset_id}.{table_id}: {str(e)}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
-            raise Exception(error_msg) from e
+            if attempt == attempts:
+                print(f"⚠️  Could not bump load generation of {dataset_id}: {str(e)}")
+                return
+            # Dataset metadata updates are rate limited; concurrent sinks can collide
+            time.sleep(2 * attempt)
+
+# Quoted strings and identifiers, or a run of whitespace and comments between them
+_SQL_TOKEN = re.compile(
+    r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)|(?:\s|--[^\n]*|#[^\n]*|/\*.*?\*/)+""",
+    re.DOTALL,
+)
+
+def normalize_sql(query: str):
+    """
+    Normalize a query for use as a cache key: comments dropped, whitespace collapsed.
+    Quoted strings and identifiers are kept as written. Queries reading the current
+    date are also keyed by today's date.
+    """
+    normalized = _SQL_TOKEN.sub(lambda m: m.group(1) or " ", query)
+    normalized = normalized.strip().rstrip(";").strip()
+    if re.search(r"\bCURRENT_(DATE|TIMESTAMP|DATETIME)\b", normalized, re.IGNORECASE):
+        normalized += f" /* {pd.Timestamp.now(tz='UTC'):%Y-%m-%d} */"
+    return normalized
 
-def query_bigquery(query: str):
+def _read_cached_result(path, generation):
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    metadata = table.schema.metadata or {}
+    cached_generation = metadata.get(b"load_generation", b"").decode()
+    cached_at = float(metadata.get(b"cached_at", b"0"))
+    if cached_generation != str(generation) or time.time() - cached_at > QUERY_CACHE_MAX_AGE:
+        return None
+    return table
+
+def _write_cached_result(path, table, generation):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"load_generation": str(generation).encode(),
+        b"cached_at": str(time.time()).encode(),
+    })
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.ipc.new_file(tmp_path, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def query_bigquery(query: str, use_cache: bool = True, dataset_id: str = "weather_events"):
     """
     Execute a query on BigQuery and return results as a pandas DataFrame.
     
+    Results are cached on disk under QUERY_CACHE_DIR, keyed by the normalized SQL, and
+    reused until the dataset's load generation changes, i.e. until new data is loaded.
+    
     Args:
         query: SQL query string
+        use_cache: reuse a cached result when the data has not changed since it was stored
+        dataset_id: dataset whose load generation invalidates cached results
     
     Returns:
         pandas DataFrame containing query results
     """
     client = get_bigquery_client()
-    query_job = client.query(query)
-    return query_job.result().to_dataframe()
+    if not use_cache:
+        return client.query(query).result().to_dataframe()
+
+    try:
+        generation = get_load_generation(client, dataset_id)
+    except Exception as e:
+        print(f"⚠️  Load generation unavailable, bypassing query cache: {str(e)}")
+        return client.query(query).result().to_dataframe()
+
+    key = hashlib.sha256(normalize_sql(query).encode("utf-8")).hexdigest()
+    path = f"{QUERY_CACHE_DIR}/{key}.arrow"
+    table = _read_cached_result(path, generation)
+    if table is None:
+        table = client.query(query).result().to_arrow()
+        try:
+            _write_cached_result(path, table, generation)
+        except OSError as e:
+            print(f"⚠️  Could not cache query result: {str(e)}")
+    return table.to_pandas()
 
 # Example usage:
 if __name__ == "__main__":
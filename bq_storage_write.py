@@ -0,0 +1,282 @@
+# bq_storage_write.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+# Rows per appended Arrow record batch; one batch is the unit of memory in flight per stream
+DEFAULT_CHUNK_ROWS = 20000
+DEFAULT_NUM_STREAMS = 4
+APPEND_ATTEMPTS = 3
+
+# BigQuery column type -> Arrow type used on the wire
+ARROW_TYPES = {
+    "STRING": pa.string(),
+    "INT64": pa.int64(),
+    "INTEGER": pa.int64(),
+    "FLOAT64": pa.float64(),
+    "FLOAT": pa.float64(),
+    "BOOL": pa.bool_(),
+    "BOOLEAN": pa.bool_(),
+    "DATE": pa.date32(),
+    "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+}
+
+
+class OffsetAlreadyExists(Exception):
+    """Raised when rows at an offset were already appended, e.g. by a retried request."""
+
+
+def arrow_schema(bq_schema, columns=None):
+    """
+    Build the Arrow schema matching a BigQuery schema, limited to the given columns.
+    """
+    return pa.schema([
+        pa.field(field.name, ARROW_TYPES[field.field_type])
+        for field in bq_schema
+        if columns is None or field.name in columns
+    ])
+
+
+def _to_record_batches(df, schema, chunk_rows):
+    df = df[[field.name for field in schema]]
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        # Convert one chunk at a time so only a chunk's Arrow copy is alive
+        table = pa.Table.from_pandas(chunk, preserve_index=False).cast(schema)
+        yield from table.to_batches()
+
+
+def _serialize(obj):
+    return obj.serialize().to_pybytes()
+
+
+class StorageWriteBackend:
+    """
+    Pending-stream operations of the BigQuery Storage Write API.
+    """
+
+    def __init__(self, project=None):
+        # Only needed for this write path, so not imported at module load
+        from google.cloud import bigquery_storage_v1
+        from google.cloud.bigquery_storage_v1 import types, writer
+        from google.api_core import exceptions
+
+        self.client = bigquery_storage_v1.BigQueryWriteClient()
+        self.project = project
+        self.types = types
+        self.writer = writer
+        self.exceptions = exceptions
+        self.append_streams = {}
+
+    def table_path(self, project, dataset_id, table_id):
+        return self.client.table_path(project or self.project, dataset_id, table_id)
+
+    def create_stream(self, table_path, serialized_schema):
+        types = self.types
+        stream = self.client.create_write_stream(
+            parent=table_path,
+            write_stream=types.WriteStream(type_=types.WriteStream.Type.PENDING),
+        )
+        template = types.AppendRowsRequest(
+            write_stream=stream.name,
+            arrow_rows=types.AppendRowsRequest.ArrowData(
+                writer_schema=types.ArrowSchema(serialized_schema=serialized_schema)
+            ),
+        )
+        self.append_streams[stream.name] = self.writer.AppendRowsStream(self.client, template)
+        return stream.name
+
+    def append(self, stream_name, serialized_batch, offset):
+        types = self.types
+        request = types.AppendRowsRequest(
+            offset=offset,
+            arrow_rows=types.AppendRowsRequest.ArrowData(
+                rows=types.ArrowRecordBatch(serialized_record_batch=serialized_batch)
+            ),
+        )
+        try:
+            self.append_streams[stream_name].send(request).result()
+        except self.exceptions.AlreadyExists as e:
+            raise OffsetAlreadyExists(str(e)) from e
+
+    def finalize(self, stream_name):
+        append_stream = self.append_streams.pop(stream_name, None)
+        if append_stream is not None:
+            append_stream.close()
+        return self.client.finalize_write_stream(name=stream_name).row_count
+
+    def commit(self, table_path, stream_names):
+        response = self.client.batch_commit_write_streams(
+            self.types.BatchCommitWriteStreamsRequest(parent=table_path, write_streams=stream_names)
+        )
+        if response.stream_errors:
+            raise Exception(f"Batch commit failed: {[e.error_message for e in response.stream_errors]}")
+
+
+class FakeStorageWriteBackend:
+    """
+    In-memory stand-in for StorageWriteBackend with the same offset and commit rules,
+    for running the write path without BigQuery.
+    """
+
+    def __init__(self, project="local"):
+        self.project = project
+        self.streams = {}
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def table_path(self, project, dataset_id, table_id):
+        return f"projects/{project or self.project}/datasets/{dataset_id}/tables/{table_id}"
+
+    def create_stream(self, table_path, serialized_schema):
+        with self.lock:
+            name = f"{table_path}/streams/{len(self.streams)}"
+            self.streams[name] = {
+                "schema": pa.ipc.read_schema(pa.py_buffer(serialized_schema)),
+                "batches": [], "rows": 0, "finalized": False,
+            }
+        return name
+
+    def append(self, stream_name, serialized_batch, offset):
+        stream = self.streams[stream_name]
+        if stream["finalized"]:
+            raise Exception(f"Stream {stream_name} is finalized")
+        if offset < stream["rows"]:
+            raise OffsetAlreadyExists(f"Offset {offset} already written to {stream_name}")
+        if offset > stream["rows"]:
+            raise Exception(f"Offset {offset} is past the end of {stream_name} ({stream['rows']} rows)")
+        batch = pa.ipc.read_record_batch(pa.py_buffer(serialized_batch), stream["schema"])
+        stream["batches"].append(batch)
+        stream["rows"] += batch.num_rows
+
+    def finalize(self, stream_name):
+        self.streams[stream_name]["finalized"] = True
+        return self.streams[stream_name]["rows"]
+
+    def commit(self, table_path, stream_names):
+        # Pending streams become visible together or not at all
+        streams = [self.streams[name] for name in stream_names]
+        if not all(stream["finalized"] for stream in streams):
+            raise Exception("Batch commit failed: every stream must be finalized")
+        with self.lock:
+            self.tables.setdefault(table_path, []).extend(
+                batch for stream in streams for batch in stream["batches"]
+            )
+
+    def read_table(self, table_path):
+        batches = self.tables.get(table_path, [])
+        return pa.Table.from_batches(batches).to_pandas() if batches else pd.DataFrame()
+
+
+def _append_with_retry(backend, stream_name, serialized_batch, offset):
+    for attempt in range(1, APPEND_ATTEMPTS + 1):
+        try:
+            backend.append(stream_name, serialized_batch, offset)
+            return
+        except OffsetAlreadyExists:
+            # An earlier attempt landed before its response was lost; the rows are written once
+            return
+        except Exception as e:
+            if attempt == APPEND_ATTEMPTS:
+                raise
+            print(f"   ⚠️  Append at offset {offset} failed ({str(e)}), retrying")
+
+
+def _abandon_streams(backend, stream_names, finalized, table_name):
+    # Uncommitted pending streams never become visible; finalize the ones still open so no
+    # append connection is left behind, and name them so a partial write can be traced
+    for name in stream_names:
+        if name in finalized:
+            continue
+        try:
+            backend.finalize(name)
+        except Exception as e:
+            print(f"   ⚠️  Could not finalize stream {name}: {str(e)}")
+    print(f"❌ Write to {table_name} failed, {len(stream_names)} stream(s) left uncommitted: {', '.join(stream_names)}")
+
+
+def write_dataframe(df, table_id, bq_schema, dataset_id="weather_events", project=None, backend=None,
+                    chunk_rows=DEFAULT_CHUNK_ROWS, num_streams=DEFAULT_NUM_STREAMS):
+    """
+    Append a DataFrame to a table through the BigQuery Storage Write API.
+
+    Rows are sent as Arrow record batches of chunk_rows rows, spread round-robin over
+    num_streams pending streams written in parallel. Each append carries its stream offset,
+    so retried appends are not duplicated, and all streams are committed in one batch commit,
+    so the rows land together or not at all. When the write fails, its streams are finalized
+    without being committed and their names are logged.
+
+    Args:
+        df: DataFrame or iterable of DataFrame chunks to append
+        table_id: ID of the BigQuery table
+        bq_schema: BigQuery schema of the table; only its columns present in df are written
+        dataset_id: ID of the BigQuery dataset
+        project: Google Cloud project, the client's default if omitted
+        backend: StorageWriteBackend or FakeStorageWriteBackend; a StorageWriteBackend is created if omitted
+        chunk_rows: rows per appended record batch
+        num_streams: number of pending streams written in parallel
+
+    Returns:
+        Number of rows committed
+    """
+    backend = backend or StorageWriteBackend(project)
+    frames = [df] if isinstance(df, pd.DataFrame) else df
+    table_path = backend.table_path(project, dataset_id, table_id)
+
+    schema = None
+    batch_number = 0
+    streams = []
+    offsets = []
+    executors = []
+    pending = []
+    finalized = set()
+    committed = False
+    try:
+        for frame in frames:
+            if frame.empty:
+                continue
+            if schema is None:
+                schema = arrow_schema(bq_schema, set(frame.columns))
+                serialized_schema = _serialize(schema)
+                # Added one by one so a failure part way still abandons the streams already open
+                for _ in range(num_streams):
+                    streams.append(backend.create_stream(table_path, serialized_schema))
+                offsets = [0] * num_streams
+                # One thread per stream keeps each stream's appends in offset order
+                executors = [ThreadPoolExecutor(max_workers=1) for _ in range(num_streams)]
+
+            for batch in _to_record_batches(frame, schema, chunk_rows):
+                i = batch_number % num_streams
+                batch_number += 1
+                pending.append(executors[i].submit(
+                    _append_with_retry, backend, streams[i], _serialize(batch), offsets[i]
+                ))
+                offsets[i] += batch.num_rows
+                # Bound the batches held in memory to about two per stream
+                if len(pending) > 2 * num_streams:
+                    pending.pop(0).result()
+
+        for future in pending:
+            future.result()
+
+        if not streams:
+            print(f"⚠️  Nothing to write to {dataset_id}.{table_id}")
+            return 0
+
+        rows = 0
+        for name in streams:
+            rows += backend.finalize(name)
+            finalized.add(name)
+        backend.commit(table_path, streams)
+        committed = True
+    finally:
+        # After a failed append, appends still queued behind it are dropped
+        for executor in executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if streams and not committed:
+            _abandon_streams(backend, streams, finalized, f"{dataset_id}.{table_id}")
+
+    print(f"✅ Committed {rows} row(s) to {dataset_id}.{table_id} over {num_streams} stream(s)")
+    return rows
@@ -0,0 +1,148 @@
+# change_detection.py
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from recommendation import comfort_scores
+
+DEFAULT_INDEX_PATH = "output/event_fingerprints.json"
+
+# Bump whenever the layout or the derivation of the event outputs changes: an index written
+# for another version is discarded, so the next run re-emits every event
+INDEX_VERSION = 5
+
+# Event fields whose change means the stored row is stale
+FINGERPRINT_FIELDS = ["status", "price_min", "price_max", "event_date", "event_time", "venue"]
+
+# Temperatures of the recommendation scenarios: the day's temperature, low and high
+SCENARIO_TEMPERATURES = ["temperature_celsius", "temp_min", "temp_max"]
+
+
+def _hash_values(values):
+    payload = json.dumps([None if pd.isna(v) else str(v) for v in values], separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def event_key(event):
+    """
+    Return the stable identity of an event: its Ticketmaster id, or name/date/venue if missing.
+    """
+    if event.get("event_id"):
+        return event["event_id"]
+    return f"{event.get('event_name')}|{event.get('event_date')}|{event.get('venue')}"
+
+
+def weather_digests(weather_df):
+    """
+    Map each (cell_id, date) to a hash of the comfort levels its forecast gives the
+    recommendation scenarios. Only a forecast change that can move an event's
+    recommendation or confidence marks the events it affects as updated; a small
+    change in the raw readings does not.
+    """
+    if weather_df is None or len(weather_df) == 0:
+        return {}
+    weather_df = pd.DataFrame(weather_df).dropna(subset=["weather_main"])
+    # The row the recommendation is scored from: the first forecast of each cell and day,
+    # i.e. the current weather for today
+    day_weather = (
+        weather_df.assign(day=pd.to_datetime(weather_df["date"]).dt.date)
+        .drop_duplicates(subset=["cell_id", "day"], keep="first")
+    )
+    scores = comfort_scores(
+        day_weather[SCENARIO_TEMPERATURES].to_numpy(),
+        day_weather[["wind_speed"]].to_numpy(),
+        day_weather[["precipitation_chance"]].to_numpy(),
+    )
+    # Recommendations only distinguish comfortable, moderate and uncomfortable
+    levels = np.clip(scores, -1, 1).tolist()
+    return {
+        (cell_id, day): _hash_values(level)
+        for cell_id, day, level in zip(day_weather["cell_id"], day_weather["day"], levels)
+    }
+
+
+def fingerprint_event(event, weather_digest=None):
+    """
+    Return a short content hash of the fields that matter for an event row.
+    """
+    values = [event.get(field) for field in FINGERPRINT_FIELDS]
+    values.append(weather_digest)
+    return _hash_values(values)
+
+
+def load_fingerprint_index(path=DEFAULT_INDEX_PATH):
+    """
+    Load the event id -> [hash, event_date] index written by the previous run.
+    """
+    try:
+        with open(path, "r") as f:
+            stored = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if not isinstance(stored, dict) or stored.get("version") != INDEX_VERSION:
+        print("Fingerprint index is from another output layout, re-emitting all events")
+        return {}
+    return stored["events"]
+
+
+def save_fingerprint_index(index, path=DEFAULT_INDEX_PATH):
+    """
+    Atomically write the fingerprint index. Call only after the delta has been loaded,
+    otherwise a failed run would hide its changes from the next one.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": INDEX_VERSION, "events": index}, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def detect_event_changes(events, index, weather_df=None, today=None):
+    """
+    Compare freshly extracted events against the fingerprint index.
+
+    Args:
+        events: list of event dicts from the extract stage
+        index: fingerprint index from load_fingerprint_index
+        weather_df: weather rows tagged with cell_id, used to detect forecast changes
+        today: date before which index entries are pruned (defaults to today)
+
+    Returns:
+        Tuple of (delta, new_index). delta is the list of inserted, updated or
+        cancelled events, each tagged with a "change_type" key.
+    """
+    today = today or pd.Timestamp("today").date()
+    digests = weather_digests(weather_df)
+
+    new_index = {
+        key: entry for key, entry in index.items()
+        if pd.to_datetime(entry[1]).date() >= today
+    }
+
+    delta = []
+    for event in events:
+        key = event_key(event)
+        event_day = pd.to_datetime(event.get("event_date")).date()
+        digest = digests.get((event.get("cell_id"), event_day))
+        fingerprint = fingerprint_event(event, digest)
+
+        previous = index.get(key)
+        new_index[key] = [fingerprint, event_day.isoformat()]
+        if previous is not None and previous[0] == fingerprint:
+            continue
+
+        if event.get("status") == "cancelled":
+            change_type = "cancel"
+        elif previous is None:
+            change_type = "insert"
+        else:
+            change_type = "update"
+        delta.append({**event, "change_type": change_type})
+
+    counts = pd.Series([e["change_type"] for e in delta], dtype="object").value_counts().to_dict()
+    print(
+        f"Change detection: {len(delta)} of {len(events)} events changed "
+        f"(insert={counts.get('insert', 0)}, update={counts.get('update', 0)}, cancel={counts.get('cancel', 0)})"
+    )
+    return delta, new_index
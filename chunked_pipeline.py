@@ -0,0 +1,178 @@
+# chunked_pipeline.py
+import argparse
+import os
+from typing import Optional
+
+import pandas as pd
+from prefect import flow, task
+
+from bigquery_utils import (
+    get_bigquery_client,
+    ensure_dataset_and_tables,
+    get_events_schema,
+    bump_load_generation,
+    update_bigquery_table,
+    replace_rollup_partitions,
+)
+from bq_storage_write import arrow_schema
+from etl_pipeline import extract, save_fingerprints, push_to_github, transform_weather, transform_events, GITHUB_FILES
+from load import (
+    DELTA_COLUMNS,
+    split_venue_dimension,
+    merge_venues,
+    merge_weather,
+    archive_path,
+    append_csv,
+    finalize_event_snapshot,
+    write_parquet_chunked,
+    read_dates_chunked,
+)
+from rollups import affected_dates, refresh_rollups
+from transform import validate_venues
+
+# Events transformed, validated and written per batch
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def iter_chunks(event_data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield DataFrames of at most chunk_size events from a list of event dicts,
+    a DataFrame, or an iterable of DataFrames (e.g. pd.read_csv(..., chunksize=...)).
+    """
+    if isinstance(event_data, pd.DataFrame):
+        for start in range(0, len(event_data), chunk_size):
+            yield event_data.iloc[start:start + chunk_size]
+        return
+
+    batch = []
+    for item in event_data:
+        if isinstance(item, pd.DataFrame):
+            yield from iter_chunks(item, chunk_size)
+            continue
+        batch.append(item)
+        if len(batch) == chunk_size:
+            yield pd.DataFrame(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+
+def run_chunked(weather_data, event_data, chunk_size=DEFAULT_CHUNK_SIZE, path_prefix="output",
+                load_warehouse=True, dataset_id="weather_events"):
+    """
+    Transform and load events in fixed-size batches, so memory does not grow with the event count.
+
+    Each batch is scored, validated, appended to the run's archive and to the new events
+    snapshot, and loaded into BigQuery before the next one is read. Only the small weather
+    frame, the venue dimension and the ids of the changed events are kept across batches.
+
+    Args:
+        weather_data: weather rows of the run
+        event_data: changed events, as accepted by iter_chunks
+        chunk_size: events per batch
+        path_prefix: output directory
+        load_warehouse: also load each batch into BigQuery
+        dataset_id: ID of the BigQuery dataset
+
+    Returns:
+        Number of events written
+    """
+    os.makedirs(path_prefix, exist_ok=True)
+    run_time = pd.Timestamp.now(tz="UTC")
+    weather_df, weather_lookup = transform_weather(weather_data)
+
+    client = None
+    if load_warehouse:
+        client = get_bigquery_client()
+        ensure_dataset_and_tables(client, dataset_id)
+
+    events_path = f"{path_prefix}/events_forecast.csv"
+    delta_path = f"{events_path}.partial"
+    if os.path.exists(delta_path):
+        os.remove(delta_path)
+    events_archive = archive_path("events_forecast", path_prefix, run_time)
+
+    delta_ids, changed_dates = set(), set()
+    venue_df = pd.DataFrame()
+    rows = 0
+    for chunk in iter_chunks(event_data, chunk_size):
+        event_df, chunk_venues = split_venue_dimension(transform_events(chunk, weather_lookup))
+        # The archive keeps the loaded_at sent to BigQuery, so a backfill finds these rows by key
+        event_df = event_df.assign(loaded_at=run_time)
+        append_csv(event_df, events_archive)
+        append_csv(event_df.drop(columns=[c for c in DELTA_COLUMNS if c in event_df.columns]), delta_path)
+        if client is not None:
+            update_bigquery_table(event_df, "events_forecast", dataset_id, client=client)
+
+        delta_ids |= set(event_df["event_id"])
+        changed_dates |= affected_dates(event_df)
+        venue_df = pd.concat([venue_df, chunk_venues]).drop_duplicates(subset=["venue_id"], keep="last")
+        rows += len(event_df)
+        print(f"   Wrote batch of {len(event_df)} event(s) ({rows} so far)")
+
+    changed_dates |= finalize_event_snapshot(delta_path, events_path, delta_ids, chunk_size=chunk_size)
+
+    weather_path = f"{path_prefix}/weather_forecast.csv"
+    weather_df.to_csv(archive_path("weather_forecast", path_prefix, run_time), index=False)
+    merge_weather(weather_df, weather_path).to_csv(weather_path, index=False)
+
+    if not venue_df.empty:
+        venue_df = validate_venues(venue_df.reset_index(drop=True)).assign(loaded_at=run_time)
+        venue_df.to_csv(archive_path("venues", path_prefix, run_time), index=False)
+        venues_path = f"{path_prefix}/venues.csv"
+        merge_venues(venue_df, venues_path).to_csv(venues_path, index=False)
+
+    # Rollups only need the rows of the touched dates
+    rollups_path = f"{path_prefix}/daily_rollups.csv"
+    snapshot_rows = read_dates_chunked(events_path, changed_dates, chunk_size=chunk_size) if rows else pd.DataFrame()
+    rollups_df, fresh_rollups = refresh_rollups(snapshot_rows, changed_dates, rollups_path)
+    rollups_df.to_csv(rollups_path, index=False)
+
+    if os.path.exists(events_path):
+        write_parquet_chunked(events_path, f"{path_prefix}/events_forecast.parquet",
+                              arrow_schema(get_events_schema()), chunk_size=chunk_size)
+
+    if client is not None:
+        update_bigquery_table(weather_df, "weather_forecast", dataset_id, client=client)
+        update_bigquery_table(venue_df, "venues", dataset_id, client=client)
+        replace_rollup_partitions(fresh_rollups, changed_dates, dataset_id, client=client)
+        # Once per run, after every batch and table is loaded
+        bump_load_generation(client, dataset_id)
+
+    print(f"✅ Chunked load finished: {rows} event(s) in batches of {chunk_size}")
+    return rows
+
+
+# Not retried: batches already appended to the archive and BigQuery would be appended twice
+@task
+def load_chunked(weather_data, event_data, chunk_size: int):
+    return run_chunked(weather_data, event_data, chunk_size)
+
+
+@flow(name="Chunked ETL Pipeline")
+def chunked_etl_pipeline(city: str = "New York", day_offsets: Optional[list] = None,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Run the ETL for a city with transform and load streamed in batches of chunk_size events.
+    """
+    weather_data, event_delta, fingerprint_index = extract(city, day_offsets)
+    load_chunked(weather_data, event_delta, chunk_size)
+    save_fingerprints(fingerprint_index)
+
+    uploads = {file_path: push_to_github.submit(file_path) for file_path in GITHUB_FILES}
+    failed = []
+    for file_path, future in uploads.items():
+        future.wait()
+        if not future.state.is_completed():
+            failed.append(f"github:{file_path}")
+    if failed:
+        raise Exception(f"Load sinks failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the ETL with transform and load in fixed-size batches")
+    parser.add_argument("--city", default="New York")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    chunked_etl_pipeline(city=args.city, chunk_size=args.chunk_size)
@@ -1,103 +1,281 @@
 from prefect import flow, task
 import pandas as pd
+import numpy as np
 import os
-from weather_api import fetch_weather_forecast
+from typing import Optional
+from weather_api import fetch_weather_for_cells
 from event_api import fetch_events_forecast_daily
-from transform import validate_weather, validate_events
-from load import save_to_csv
-from recommendation import generate_recommendation
+from transform import validate_weather, validate_events, validate_venues
+from load import save_to_csv, split_venue_dimension
+from recommendation import score_scenarios, recommendation_confidence
+from venue_classifier import get_venue_classifier
 from upload_github import upload_to_github
-from bigquery_utils import update_bigquery_data
+from bigquery_utils import update_bigquery_table, replace_rollup_partitions, bump_load_generation, get_bigquery_client
+from geo_grid import assign_cells
+from change_detection import detect_event_changes, load_fingerprint_index, save_fingerprint_index
 
-@task
-def extract():
+def extract_data(city, day_offsets, fingerprint_index):
+    """
+    Fetch events and per-cell weather for a city and compare the events against the
+    fingerprint index.
+
+    Returns:
+        Tuple of (weather rows, changed events, updated fingerprint index)
+    """
     weather_api_key = os.getenv("WEATHER_API_KEY")
     event_api_key = os.getenv("EVENT_API_KEY")
 
     if not weather_api_key or not event_api_key:
         raise ValueError("Missing WEATHER_API_KEY or EVENT_API_KEY in environment variables.")
 
-    weather_data = fetch_weather_forecast(weather_api_key)
-    event_data = fetch_events_forecast_daily(event_api_key)
-    return weather_data, event_data
+    event_data = fetch_events_forecast_daily(event_api_key, city=city, day_offsets=day_offsets)
 
-@task
-def transform(weather_data: list, event_data: list):
+    # Fetch weather once per occupied grid cell instead of once per venue
+    cells = assign_cells(event_data)
+    print(f"Fetching weather for {len(cells)} grid cell(s) covering {len(event_data)} events")
+    weather_data = fetch_weather_for_cells(weather_api_key, cells, city=city)
+    if day_offsets is not None and not weather_data.empty:
+        # A partial refresh only owns the weather rows of its own days
+        today = pd.Timestamp("today").normalize()
+        slice_days = [today + pd.Timedelta(days=offset) for offset in day_offsets]
+        weather_data = weather_data[weather_data["date"].isin(slice_days)].reset_index(drop=True)
+
+    # Only events that changed since the last successful run move on to transform and load
+    event_delta, fingerprint_index = detect_event_changes(event_data, fingerprint_index, weather_data)
+    return weather_data, event_delta, fingerprint_index
+
+def transform_weather(weather_data):
+    """
+    Cast and validate the weather rows and build the (cell_id, day) forecast lookup.
+
+    Returns:
+        Tuple of (weather_df, weather_lookup)
+    """
     weather_df = pd.DataFrame(weather_data)
-    event_df = pd.DataFrame(event_data)
+    if weather_df.empty:
+        # No events means no grid cells, so a quiet city or day has no weather to validate
+        return weather_df, weather_df.assign(day=None).set_index(["cell_id", "day"])
     weather_df["date"] = pd.to_datetime(weather_df["date"])
-    event_df["event_date"] = pd.to_datetime(event_df["event_date"])
 
     float_columns = [
         "temperature_celsius", "feels_like", "temp_min", "temp_max",
         "humidity", "pressure", "wind_speed", "cloudiness", "precipitation_chance"
     ]
     weather_df[float_columns] = weather_df[float_columns].astype(float)
-    weather_lookup = weather_df.set_index(weather_df["date"].dt.date)
-
-    recommendations = []
-    for _, row in event_df.iterrows():
-        event_day = row["event_date"].date()
-        today_weather = weather_lookup.loc[event_day] if event_day in weather_lookup.index else None
-        if isinstance(today_weather, pd.DataFrame):
-            today_weather = today_weather.dropna(subset=["weather_main"]).iloc[0] if not today_weather.dropna(subset=["weather_main"]).empty else None
-        elif today_weather is not None and pd.isna(today_weather.get("weather_main", None)):
-            today_weather = None
-
-        if today_weather is not None:
-            rec = generate_recommendation(
-                today_weather["temperature_celsius"],
-                today_weather["feels_like"],
-                today_weather["humidity"],
-                today_weather["wind_speed"],
-                today_weather["weather_main"],
-                today_weather["precipitation_chance"],
-                row["venue"]
-            )
-        else:
-            rec = "No Recommendation"
-
-        recommendations.append(rec)
-
-    # Add recommendation
-    event_df["recommendation"] = recommendations
-    
-    weather_df = validate_weather(weather_df)
-    event_df = validate_events(event_df)
-    
-    return weather_df.reset_index(drop=True), event_df.reset_index(drop=True)
+
+    # One forecast per (cell, day); the current-weather row wins over the noon forecast for today
+    weather_lookup = (
+        weather_df.dropna(subset=["weather_main"])
+        .assign(day=weather_df["date"].dt.date)
+        .drop_duplicates(subset=["cell_id", "day"], keep="first")
+        .set_index(["cell_id", "day"])
+    )
+    return validate_weather(weather_df).reset_index(drop=True), weather_lookup
+
+def transform_events(event_data, weather_lookup):
+    """
+    Attach a recommendation to each event from the forecast of its cell and day, and validate them.
+    """
+    event_df = pd.DataFrame(event_data)
+    if event_df.empty:
+        return event_df
+
+    event_df["event_date"] = pd.to_datetime(event_df["event_date"])
+    # A small delta can have a numeric column that is entirely missing
+    event_float_columns = ["price_min", "price_max", "latitude", "longitude"]
+    event_df[event_float_columns] = event_df[event_float_columns].astype(float)
+
+    # Score every event at its day's temperature, low and high in one batch; the published
+    # recommendation uses the day's temperature and the confidence says how many agree with it
+    day_weather = weather_lookup.reindex(pd.MultiIndex.from_arrays([event_df["cell_id"], event_df["event_date"].dt.date]))
+    has_weather = day_weather["weather_main"].notna().to_numpy()
+    scenarios = score_scenarios(
+        event_df["venue"],
+        day_weather[["temperature_celsius", "temp_min", "temp_max"]].to_numpy(),
+        day_weather[["wind_speed"]].to_numpy(),
+        day_weather[["precipitation_chance"]].to_numpy(),
+    )
+    event_df["recommendation"] = np.where(has_weather, scenarios["recommendation"][:, 0], "No Recommendation")
+    event_df["recommendation_confidence"] = np.where(
+        has_weather, recommendation_confidence(scenarios["recommendation"]), np.nan
+    )
+    # Venues classified for the first time are remembered for later runs
+    get_venue_classifier().save()
+
+    return validate_events(event_df).reset_index(drop=True)
+
+def transform_frames(weather_data, event_data):
+    """
+    Transform and validate the weather rows and the events they apply to.
+    """
+    weather_df, weather_lookup = transform_weather(weather_data)
+    if len(event_data) == 0:
+        print("No changed events to transform")
+        return weather_df, pd.DataFrame(event_data)
+    return weather_df, transform_events(event_data, weather_lookup)
+
+@task
+def extract(city: str = "New York", day_offsets: Optional[list] = None):
+    return extract_data(city, day_offsets, load_fingerprint_index())
 
 @task
-def load(weather_df: pd.DataFrame, event_df: pd.DataFrame):
-    # Save to CSV for Streamlit
-    save_to_csv(weather_df, event_df)
-    
-    # Update BigQuery data
+def transform(weather_data: list, event_data: list):
+    return transform_frames(weather_data, event_data)
+
+GITHUB_REPO = "samantha0820/weather-event-etl"
+GITHUB_FILES = [
+    "output/weather_forecast.csv", "output/events_forecast.csv",
+    "output/venues.csv", "output/daily_rollups.csv"
+]
+
+# Load sinks are independent once the frames exist; each one retries on its own
+@task(retries=2, retry_delay_seconds=10)
+def save_csv(weather_df: pd.DataFrame, event_df: pd.DataFrame, venue_df: pd.DataFrame):
+    # Save to CSV for Streamlit; returns the recomputed rollups and the dates they cover
+    return save_to_csv(weather_df, event_df, venue_df)
+
+# Retries are safe: rows a timed-out attempt already wrote are found by their key and skipped
+@task(retries=2, retry_delay_seconds=30)
+def load_bigquery(df: pd.DataFrame, table_id: str):
     try:
-        print(f"Starting BigQuery update...")
-        print(f"Weather data: {len(weather_df)} rows")
-        print(f"Event data: {len(event_df)} rows")
-        update_bigquery_data(weather_df, event_df)
-        print("✅ BigQuery update completed successfully")
+        print(f"Starting BigQuery update of {table_id}: {len(df)} rows")
+        inserted = update_bigquery_table(df, table_id)
+        print(f"✅ BigQuery update of {table_id} completed successfully")
+        return inserted
     except Exception as e:
         error_msg = f"❌ Error updating BigQuery: {str(e)}"
         print(error_msg)
-        import traceback
-        traceback.print_exc()
         # Re-raise the exception so Prefect marks the task as failed
         raise Exception(error_msg) from e
 
+@task(retries=2, retry_delay_seconds=30)
+def load_rollups(csv_result: tuple):
+    rollups_df, dates = csv_result
+    return replace_rollup_partitions(rollups_df, dates)
+
+@task(retries=2, retry_delay_seconds=10)
+def push_to_github(file_path: str):
+    upload_to_github(file_path, GITHUB_REPO, file_path)
+
+@task
+def mark_data_loaded():
+    # Invalidates cached dashboard queries; a failed bump is only reported
+    bump_load_generation(get_bigquery_client())
+
 @task
-def github_push():
-    upload_to_github("output/weather_forecast.csv", "samantha0820/weather-event-etl", "output/weather_forecast.csv")
-    upload_to_github("output/events_forecast.csv", "samantha0820/weather-event-etl", "output/events_forecast.csv")
+def split_venues(event_df: pd.DataFrame):
+    # Venue attributes are stored once per venue rather than on every event
+    event_df, venue_df = split_venue_dimension(event_df)
+    if not venue_df.empty:
+        venue_df = validate_venues(venue_df)
+    return event_df, venue_df
+
+# Sinks that need the events split from their venues
+EVENT_SINKS = [
+    "csv", "bigquery:events_forecast", "bigquery:venues", "bigquery:daily_rollups"
+] + [f"github:{file_path}" for file_path in GITHUB_FILES]
+
+# Sinks holding the data; GitHub uploads only publish copies of the CSV outputs
+DATA_SINKS = ["csv", "bigquery:weather_forecast", "bigquery:events_forecast", "bigquery:venues", "bigquery:daily_rollups"]
+
+def load(weather_df: pd.DataFrame, event_df: pd.DataFrame, publish_github: bool = True):
+    """
+    Fan out to every sink concurrently and wait for all of them, then mark the
+    dataset as changed if any BigQuery sink wrote to it.
+    A failing sink does not stop the others.
+
+    Args:
+        publish_github: also push the CSV outputs to GitHub
+
+    Returns:
+        Dict mapping sink name to whether it completed
+    """
+    # The weather load does not depend on the venue split, so it starts right away
+    sinks = {"bigquery:weather_forecast": load_bigquery.submit(weather_df, "weather_forecast")}
+
+    venue_split = split_venues.submit(event_df)
+    venue_split.wait()
+    if venue_split.state.is_completed():
+        event_df, venue_df = venue_split.result()
+        # Stamped once, outside the retried sinks, so every attempt writes the same row keys
+        loaded_at = pd.Timestamp.now(tz="UTC")
+        if "change_type" in event_df.columns:
+            event_df = event_df.assign(loaded_at=loaded_at)
+        venue_df = venue_df.assign(loaded_at=loaded_at)
+
+        csv_future = save_csv.submit(weather_df, event_df, venue_df)
+        sinks.update({
+            "csv": csv_future,
+            "bigquery:events_forecast": load_bigquery.submit(event_df, "events_forecast"),
+            "bigquery:venues": load_bigquery.submit(venue_df, "venues"),
+            # Rollups are recomputed from the merged CSV snapshot, so they follow the CSV sink
+            "bigquery:daily_rollups": load_rollups.submit(csv_future),
+        })
+        # GitHub uploads publish the CSVs, so they only need the CSV sink
+        for file_path in GITHUB_FILES if publish_github else []:
+            sinks[f"github:{file_path}"] = push_to_github.submit(file_path, wait_for=[csv_future])
+    else:
+        print(f"❌ Venue split failed, skipping the event sinks: {venue_split.state.message}")
+
+    results = {}
+    for name, future in sinks.items():
+        future.wait()
+        results[name] = future.state.is_completed()
+        if not results[name]:
+            print(f"❌ Sink {name} failed: {future.state.message}")
+
+    # The load generation is bumped once per run, after every BigQuery sink finished. A failed
+    # sink may have written part of its rows, so it counts as a change too
+    if any(
+        not results[name] or future.result()
+        for name, future in sinks.items() if name.startswith("bigquery:")
+    ):
+        mark_data_loaded()
+    # Event sinks never started when the venue split failed
+    for name in EVENT_SINKS:
+        if publish_github or not name.startswith("github:"):
+            results.setdefault(name, False)
+    return results
+
+@task
+def save_fingerprints(fingerprint_index: dict):
+    # Written only after the load succeeded so a failed run re-emits its delta next time
+    save_fingerprint_index(fingerprint_index)
+
+def check_sink_results(sink_results):
+    """
+    Raise if a data sink failed. A failed GitHub upload is only reported: the data is
+    already stored, and the next published run uploads the current CSVs.
+    """
+    unpublished = [name for name, ok in sink_results.items() if name.startswith("github:") and not ok]
+    if unpublished:
+        print(f"⚠️  Not published: {', '.join(unpublished)}")
+    failed = [name for name in DATA_SINKS if not sink_results[name]]
+    if failed:
+        raise Exception(f"Load sinks failed: {', '.join(failed)}")
 
 @flow(name="Daily ETL Pipeline")
-def etl_pipeline():
-    weather_data, event_data = extract()
-    weather_df, event_df = transform(weather_data, event_data)
-    load(weather_df, event_df)
-    github_push()
+def etl_pipeline(city: str = "New York", day_offsets: Optional[list] = None, publish_github: bool = True):
+    """
+    Run the ETL for a city. day_offsets restricts the run to some of the next
+    5 days (e.g. [0] for today only); by default all 5 days are refreshed.
+    publish_github=False skips pushing the CSV outputs to GitHub.
+
+    Returns:
+        Dict mapping sink name to whether it completed
+    """
+    weather_data, event_delta, fingerprint_index = extract(city, day_offsets)
+    weather_df, event_df = transform(weather_data, event_delta)
+    sink_results = load(weather_df, event_df, publish_github)
+
+    # The delta is only consumed once both the snapshot and the warehouse have it
+    if all(sink_results[name] for name in [
+        "csv", "bigquery:events_forecast", "bigquery:venues", "bigquery:daily_rollups"
+    ]):
+        save_fingerprints(fingerprint_index)
+
+    check_sink_results(sink_results)
+    return sink_results
 
 if __name__ == "__main__":
     etl_pipeline()
\ No newline at end of file
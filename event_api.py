@@ -1,27 +1,152 @@
 import requests
+import sys
 import pandas as pd
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-import time
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
+from quota_ledger import get_ledger
+from resilience import CircuitOpen, get_guard, request_key
 
-def create_session_with_retry():
+def create_session_with_retry(pool_maxsize=10, retries=3, quota_guarded=False):
     """
-    Create a requests session with retry mechanism
+    Create a requests session with retry mechanism.
+    pool_maxsize is the number of keep-alive connections kept per host.
+    Calls guarded by a circuit breaker use fewer retries, the breaker handles repeated failures.
+    Calls booked in the quota ledger (quota_guarded) only retry connection failures: a request
+    that reached the API must not be sent again without a new reservation.
     """
     session = requests.Session()
-    retry_strategy = Retry(
-        total=3,  # number of retries
-        backoff_factor=1,  # wait 1, 2, 4 seconds between retries
-        status_forcelist=[429, 500, 502, 503, 504]  # HTTP status codes to retry on
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    if quota_guarded:
+        retry_strategy = Retry(
+            total=retries,
+            connect=retries,  # the request never reached the API
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=1,
+        )
+    else:
+        retry_strategy = Retry(
+            total=retries,  # number of retries
+            backoff_factor=1,  # wait 1, 2, 4 seconds between retries
+            status_forcelist=[429, 500, 502, 503, 504]  # HTTP status codes to retry on
+        )
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
 
-def fetch_events_forecast_daily(api_key, city="New York"):
+# Nested objects resolved once per event; fields below are read relative to them
+EVENT_ROOTS = {
+    "event": (),
+    "start": ("dates", "start"),
+    "price": ("priceRanges", 0),
+}
+VENUE_ROOT = ("_embedded", "venues", 0)
+
+# (column, root, path within root, default when the path is missing)
+EVENT_FIELDS = [
+    ("event_id", "event", ("id",), None),
+    ("event_name", "event", ("name",), None),
+    ("event_date", "start", ("localDate",), None),
+    ("event_time", "start", ("localTime",), "Unknown"),
+    ("price_min", "price", ("min",), None),
+    ("price_max", "price", ("max",), None),
+    ("category", "event", ("classifications", 0, "segment", "name"), "Undefined"),
+    ("status", "event", ("dates", "status", "code"), None),
+    ("event_url", "event", ("url",), None),
+    ("image_url", "event", ("images", 0, "url"), None),
+]
+
+# (column, path within the first venue, default); resolved once per venue id
+VENUE_FIELDS = [
+    ("venue_id", ("id",), None),
+    ("venue", ("name",), None),
+    ("address", ("address", "line1"), "Unknown"),
+    ("city", ("city", "name"), None),
+    ("latitude", ("location", "latitude"), None),
+    ("longitude", ("location", "longitude"), None),
+]
+
+# Events missing any of these cannot be placed or shown and are dropped
+REQUIRED_EVENT_COLUMNS = ["event_name", "event_date", "venue", "status"]
+
+_MISSING = object()
+
+def _resolve(obj, path):
+    for key in path:
+        try:
+            obj = obj[key]
+        except (KeyError, IndexError, TypeError):
+            return _MISSING
+    return obj
+
+def _venue_attributes(venue, venue_registry):
+    venue_id = _resolve(venue, ("id",))
+    cached = venue_registry.get(venue_id) if venue_id is not _MISSING else None
+    if cached is not None:
+        return cached
+
+    values = []
+    for _, path, default in VENUE_FIELDS:
+        value = _resolve(venue, path)
+        value = default if value is _MISSING or value is None else value
+        values.append(sys.intern(value) if isinstance(value, str) else value)
+    values = tuple(values)
+    if venue_id is not _MISSING:
+        venue_registry[venue_id] = values
+    return values
+
+def extract_event_columns(events, venue_registry=None):
+    """
+    Flatten a page of Ticketmaster events into column arrays in one pass.
+
+    Missing fields fall back to their default per row instead of failing the page.
+    Venue attributes are resolved once per venue id and interned in venue_registry, a dict
+    shared by the pages of one fetch (a new one per call if omitted). The same few venues
+    host most events, so their strings are stored once, and the next fetch sees venue changes.
+
+    Returns:
+        DataFrame with one column per EVENT_FIELDS and VENUE_FIELDS entry plus free_or_paid
+    """
+    columns = {name: [] for name, _, _, _ in EVENT_FIELDS}
+    appenders = [(columns[name].append, root, path, default) for name, root, path, default in EVENT_FIELDS]
+    venue_columns = [[] for _ in VENUE_FIELDS]
+    free_or_paid = []
+    venue_registry = {} if venue_registry is None else venue_registry
+
+    for event in events:
+        roots = {name: _resolve(event, path) for name, path in EVENT_ROOTS.items()}
+        for append, root, path, default in appenders:
+            value = _resolve(roots[root], path)
+            append(default if value is _MISSING or value is None else value)
+        for column, value in zip(venue_columns, _venue_attributes(_resolve(event, VENUE_ROOT), venue_registry)):
+            column.append(value)
+        free_or_paid.append("Paid" if roots["price"] is not _MISSING else "Free")
+
+    for (name, _, _), values in zip(VENUE_FIELDS, venue_columns):
+        columns[name] = values
+    page_df = pd.DataFrame(columns)
+    page_df["free_or_paid"] = free_or_paid
+
+    incomplete = page_df[REQUIRED_EVENT_COLUMNS].isna().any(axis=1)
+    if incomplete.any():
+        print(f"Skipping {int(incomplete.sum())} event(s) missing {', '.join(REQUIRED_EVENT_COLUMNS)}")
+        page_df = page_df[~incomplete]
+    return page_df
+
+def fetch_events_forecast_daily(api_key, city="New York", day_offsets=None):
+    """
+    Fetch up to 50 events per day for the next 5 days.
+
+    Args:
+        api_key: Ticketmaster API key
+        city: city to search
+        day_offsets: days relative to today to fetch (e.g. [0] for today only);
+                     defaults to all 5 days
+    """
+    day_offsets = sorted(day_offsets) if day_offsets is not None else list(range(5))
     url = "https://app.ticketmaster.com/discovery/v2/events.json"
     
     # List of event classifications to fetch
@@ -33,15 +158,20 @@ def fetch_events_forecast_daily(api_key, city="New York"):
         "Fairs & Festivals"
     ]
     
-    # Start from today's date
+    # Start from the first requested day and stop at the end of the last one
     ny_now = datetime.now(ZoneInfo("America/New_York"))
-    start_datetime_ny = ny_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    today_start_ny = ny_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_datetime_ny = today_start_ny + timedelta(days=day_offsets[0])
+    end_datetime_ny = today_start_ny + timedelta(days=day_offsets[-1] + 1)
 
     # Use utc time
     start_datetime_utc = start_datetime_ny.astimezone(ZoneInfo("UTC"))
+    end_datetime_utc = end_datetime_ny.astimezone(ZoneInfo("UTC"))
 
     all_events = []
-    session = create_session_with_retry()
+    venue_registry = {}
+    session = create_session_with_retry(retries=1, quota_guarded=True)
+    guard = get_guard("ticketmaster:events")
 
     # Fetch events for each classification separately
     for classification in classification_list:
@@ -51,49 +181,42 @@ def fetch_events_forecast_daily(api_key, city="New York"):
             "countryCode": "US",
             "classificationName": classification,
             "startDateTime": start_datetime_utc.isoformat().replace("+00:00", "Z"),
+            "endDateTime": end_datetime_utc.isoformat().replace("+00:00", "Z"),
             "sort": "date,asc",
             "size": 200
         }
         
-        try:
-            # Add delay between requests
-            time.sleep(1)  # Wait 1 second between requests
-            
-            response = session.get(url, params=params)
+        def request_page(params=params):
+            response = session.get(url, params=params, timeout=guard.timeout)
             response.raise_for_status()
-            data = response.json()
-
-            events = []
-            for event in data.get('_embedded', {}).get('events', []):
-                events.append({
-                    "event_name": event["name"],
-                    "event_date": event["dates"]["start"]["localDate"],
-                    "event_time": event["dates"]["start"].get("localTime", "Unknown"),
-                    "venue": event["_embedded"]["venues"][0]["name"],
-                    "address": event["_embedded"]["venues"][0].get("address", {}).get("line1", "Unknown"),
-                    "city": event["_embedded"]["venues"][0]["city"]["name"],
-                    "price_min": event.get("priceRanges", [{}])[0].get("min", None),
-                    "price_max": event.get("priceRanges", [{}])[0].get("max", None),
-                    "category": event["classifications"][0]["segment"]["name"],
-                    "free_or_paid": "Paid" if event.get("priceRanges") else "Free",
-                    "status": event["dates"]["status"]["code"],
-                    "event_url": event.get("url", None),
-                    "image_url": event.get("images", [{}])[0].get("url", None)
-                })
-            
-            all_events.extend(events)
-            
-        except requests.exceptions.RequestException as e:
+            return response.json()
+
+        try:
+            # Falls back to the last response for this query while Ticketmaster is unhealthy.
+            # Waits for budget in the shared quota ledger instead of a fixed delay
+            data = guard.call(
+                request_page,
+                cache_key=request_key(params),
+                reserve=lambda: get_ledger().reserve("ticketmaster"),
+            )
+
+            page_events = data.get('_embedded', {}).get('events', [])
+            all_events.append(extract_event_columns(page_events, venue_registry))
+
+        except (requests.exceptions.RequestException, CircuitOpen) as e:
             print(f"Error fetching {classification} events: {str(e)}")
             continue
 
     # Combine all events from different classifications
-    events_df = pd.DataFrame(all_events)
+    events_df = pd.concat(all_events, ignore_index=True) if all_events else extract_event_columns([])
 
     today_ny = ny_now.date()
-    valid_days = [(today_ny + timedelta(days=i)) for i in range(5)]
+    valid_days = [(today_ny + timedelta(days=i)) for i in day_offsets]
 
     events_df["event_date"] = pd.to_datetime(events_df["event_date"]).dt.date
+    events_df["city"] = events_df["city"].fillna(city)
+    numeric_columns = ["latitude", "longitude", "price_min", "price_max"]
+    events_df[numeric_columns] = events_df[numeric_columns].apply(pd.to_numeric, errors="coerce")
 
     daily_events = []
     for day in valid_days:
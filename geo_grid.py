@@ -0,0 +1,62 @@
+# geo_grid.py
+import math
+
+# Roughly 11 km north-south per cell, small enough that every venue in a cell
+# shares the same OpenWeather forecast point.
+DEFAULT_CELL_SIZE_DEG = 0.1
+
+# Prefix of the per-city cell used for venues without coordinates; its weather is fetched by city name.
+CITY_CELL_PREFIX = "city:"
+
+
+def cell_id_for(lat, lon, cell_size=DEFAULT_CELL_SIZE_DEG):
+    """
+    Return the grid cell id for a coordinate, or None if the coordinate is missing.
+    """
+    if lat is None or lon is None:
+        return None
+    try:
+        lat = float(lat)
+        lon = float(lon)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(lat) or math.isnan(lon):
+        return None
+    return f"{math.floor(lat / cell_size)}:{math.floor(lon / cell_size)}"
+
+
+def cell_center(cell_id, cell_size=DEFAULT_CELL_SIZE_DEG):
+    """
+    Return the (lat, lon) center of a grid cell.
+    """
+    lat_idx, lon_idx = (int(part) for part in cell_id.split(":"))
+    return (
+        round((lat_idx + 0.5) * cell_size, 4),
+        round((lon_idx + 0.5) * cell_size, 4),
+    )
+
+
+def assign_cells(events, cell_size=DEFAULT_CELL_SIZE_DEG):
+    """
+    Tag each event record with the grid cell of its venue.
+
+    Args:
+        events: list of event dicts with "latitude" and "longitude" keys
+        cell_size: cell edge length in degrees
+
+    Returns:
+        Dict mapping each occupied cell id to its (lat, lon) center.
+        Events without coordinates are put in a "city:<name>" cell, whose center is None.
+    """
+    cells = {}
+    for event in events:
+        cell_id = cell_id_for(event.get("latitude"), event.get("longitude"), cell_size)
+        if cell_id is None:
+            cell_id = f"{CITY_CELL_PREFIX}{event.get('city')}"
+            event["cell_id"] = cell_id
+            cells.setdefault(cell_id, None)
+            continue
+        event["cell_id"] = cell_id
+        if cell_id not in cells:
+            cells[cell_id] = cell_center(cell_id, cell_size)
+    return cells
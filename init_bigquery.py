@@ -36,15 +36,24 @@ def init_bigquery_tables():
         bigquery.SchemaField("precipitation_chance", "FLOAT64"),
         bigquery.SchemaField("weather_main", "STRING"),
         bigquery.SchemaField("weather_description", "STRING"),
+        bigquery.SchemaField("cell_id", "STRING"),
+        bigquery.SchemaField("latitude", "FLOAT64"),
+        bigquery.SchemaField("longitude", "FLOAT64"),
+        bigquery.SchemaField("fetched_at", "TIMESTAMP"),
     ]
     
     events_schema = [
+        bigquery.SchemaField("event_id", "STRING"),
         bigquery.SchemaField("event_name", "STRING"),
         bigquery.SchemaField("event_date", "DATE"),
         bigquery.SchemaField("event_time", "STRING"),
+        bigquery.SchemaField("venue_id", "STRING"),
         bigquery.SchemaField("venue", "STRING"),
         bigquery.SchemaField("address", "STRING"),
         bigquery.SchemaField("city", "STRING"),
+        bigquery.SchemaField("latitude", "FLOAT64"),
+        bigquery.SchemaField("longitude", "FLOAT64"),
+        bigquery.SchemaField("cell_id", "STRING"),
         bigquery.SchemaField("price_min", "FLOAT64"),
         bigquery.SchemaField("price_max", "FLOAT64"),
         bigquery.SchemaField("category", "STRING"),
@@ -53,12 +62,44 @@ def init_bigquery_tables():
         bigquery.SchemaField("event_url", "STRING"),
         bigquery.SchemaField("image_url", "STRING"),
         bigquery.SchemaField("recommendation", "STRING"),
+        bigquery.SchemaField("recommendation_confidence", "FLOAT64"),
+        bigquery.SchemaField("change_type", "STRING"),
+        bigquery.SchemaField("loaded_at", "TIMESTAMP"),
+    ]
+    
+    venues_schema = [
+        bigquery.SchemaField("venue_id", "STRING"),
+        bigquery.SchemaField("venue", "STRING"),
+        bigquery.SchemaField("address", "STRING"),
+        bigquery.SchemaField("city", "STRING"),
+        bigquery.SchemaField("latitude", "FLOAT64"),
+        bigquery.SchemaField("longitude", "FLOAT64"),
+        # A changed venue is appended as a new version; readers keep the latest per venue_id
+        bigquery.SchemaField("attributes_hash", "STRING"),
+        bigquery.SchemaField("loaded_at", "TIMESTAMP"),
+    ]
+    
+    rollups_schema = [
+        bigquery.SchemaField("event_date", "DATE"),
+        bigquery.SchemaField("category", "STRING"),
+        bigquery.SchemaField("recommendation", "STRING"),
+        bigquery.SchemaField("event_count", "INT64"),
+        bigquery.SchemaField("paid_count", "INT64"),
+        bigquery.SchemaField("free_count", "INT64"),
+        bigquery.SchemaField("priced_count", "INT64"),
+        bigquery.SchemaField("price_min_avg", "FLOAT64"),
+        bigquery.SchemaField("price_min_p25", "FLOAT64"),
+        bigquery.SchemaField("price_min_p50", "FLOAT64"),
+        bigquery.SchemaField("price_min_p75", "FLOAT64"),
+        bigquery.SchemaField("price_max_max", "FLOAT64"),
     ]
     
     # Create tables
     tables = [
         ("weather_forecast", weather_schema),
-        ("events_forecast", events_schema)
+        ("events_forecast", events_schema),
+        ("venues", venues_schema),
+        ("daily_rollups", rollups_schema)
     ]
     
     for table_id, schema in tables:
@@ -68,6 +109,12 @@ def init_bigquery_tables():
             print(f"Table {dataset_id}.{table_id} already exists")
         except NotFound:
             table = bigquery.Table(table_ref, schema=schema)
+            if table_id == "daily_rollups":
+                # Partitioned by day so a refresh replaces only the dates it touched
+                table.time_partitioning = bigquery.TimePartitioning(
+                    type_=bigquery.TimePartitioningType.DAY,
+                    field="event_date",
+                )
             client.create_table(table)
             print(f"Created table {dataset_id}.{table_id}")
 
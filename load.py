@@ -1,7 +1,233 @@
+import hashlib
+import json
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+from rollups import affected_dates, refresh_rollups
 
-def save_to_csv(weather_df, event_df, path_prefix="output"):
+# Delta bookkeeping columns that are not part of the CSV snapshot
+DELTA_COLUMNS = ["change_type", "loaded_at"]
+
+# Venue attributes kept once per venue in the venue dimension instead of on every event
+VENUE_COLUMNS = ["venue_id", "venue", "address", "city", "latitude", "longitude"]
+
+def venue_attributes_hash(venue_df):
+    """
+    Return a short hash of each venue's attributes, so a changed venue is stored as a new version.
+    """
+    attributes = venue_df[VENUE_COLUMNS[1:]].astype(object)
+    return pd.Series([
+        hashlib.sha1(json.dumps(
+            [None if pd.isna(value) else str(value) for value in row], separators=(",", ":")
+        ).encode("utf-8")).hexdigest()[:16]
+        for row in attributes.itertuples(index=False)
+    ], index=venue_df.index, dtype=object)
+
+def split_venue_dimension(event_df):
+    """
+    Split events into an event table keyed by venue_id and a venue dimension table.
+    Venues without a Ticketmaster id are keyed by their name.
+
+    Returns:
+        Tuple of (events without venue attributes, one row per venue with its attributes_hash)
+    """
+    if "venue" not in event_df.columns:
+        return event_df, pd.DataFrame(columns=VENUE_COLUMNS + ["attributes_hash"])
+
+    event_df = event_df.copy()
+    missing_id = event_df["venue_id"].isna()
+    event_df.loc[missing_id, "venue_id"] = "name:" + event_df.loc[missing_id, "venue"]
+
+    venue_df = event_df[VENUE_COLUMNS].drop_duplicates(subset=["venue_id"], keep="last").reset_index(drop=True)
+    venue_df["attributes_hash"] = venue_attributes_hash(venue_df)
+    return event_df.drop(columns=VENUE_COLUMNS[1:]), venue_df
+
+def merge_venues(venue_df, venues_path):
+    """
+    Upsert venues into the existing venues CSV by venue_id.
+    """
+    try:
+        existing = pd.read_csv(venues_path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return venue_df
+    if venue_df.empty:
+        return existing
+    existing = existing[~existing["venue_id"].isin(venue_df["venue_id"])]
+    return pd.concat([existing, venue_df], ignore_index=True).sort_values("venue_id").reset_index(drop=True)
+
+def merge_event_delta(event_df, events_path, today=None):
+    """
+    Apply an event delta to the existing events CSV snapshot.
+    Changed rows replace their previous version and past events are dropped.
+    """
+    today = today or pd.Timestamp("today").normalize()
+    delta = event_df.drop(columns=[c for c in DELTA_COLUMNS if c in event_df.columns])
+
+    try:
+        existing = pd.read_csv(events_path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        existing = pd.DataFrame(columns=delta.columns)
+
+    # Snapshots written with an older layout are rebuilt; the fingerprint index version is
+    # bumped with every layout change, so such a delta carries all current events
+    if not delta.empty:
+        if not set(delta.columns) <= set(existing.columns):
+            existing = pd.DataFrame(columns=delta.columns)
+        existing = existing[delta.columns]
+
+    if not delta.empty:
+        existing = existing[~existing["event_id"].isin(delta["event_id"])]
+    merged = pd.concat([existing, delta], ignore_index=True) if not existing.empty else delta
+    if "event_date" not in merged.columns:
+        return merged
+
+    merged["event_date"] = pd.to_datetime(merged["event_date"])
+    merged = merged[merged["event_date"] >= today].copy()
+    merged["event_date"] = merged["event_date"].dt.date
+    return merged.sort_values(["event_date", "event_time"], kind="stable").reset_index(drop=True)
+
+def merge_weather(weather_df, weather_path, today=None):
+    """
+    Replace the rows of the existing weather CSV for the (cell, date) pairs in weather_df,
+    so a partial refresh keeps the other days. Past dates are dropped.
+    """
+    today = today or pd.Timestamp("today").normalize()
+    try:
+        existing = pd.read_csv(weather_path, parse_dates=["date"])
+    except (FileNotFoundError, pd.errors.EmptyDataError, ValueError):
+        return weather_df
+
+    # Snapshots written before per-cell weather are replaced entirely
+    if "cell_id" not in existing.columns or weather_df.empty:
+        return weather_df if not weather_df.empty else existing
+
+    refreshed = pd.MultiIndex.from_frame(weather_df[["cell_id", "date"]].assign(date=pd.to_datetime(weather_df["date"])))
+    keep = ~pd.MultiIndex.from_frame(existing[["cell_id", "date"]]).isin(refreshed)
+    merged = pd.concat([existing[keep], weather_df], ignore_index=True)
+    merged["date"] = pd.to_datetime(merged["date"])
+    merged = merged[merged["date"] >= today]
+    return merged.sort_values(["date", "cell_id"], kind="stable").reset_index(drop=True)
+
+def archive_path(table_id, path_prefix="output", run_time=None):
+    """
+    Return the archive file of one table for a run, creating its directory.
+    """
+    archive_dir = f"{path_prefix}/archive/{run_time:%Y-%m-%d}"
+    os.makedirs(archive_dir, exist_ok=True)
+    return f"{archive_dir}/{run_time:%H%M%S}_{table_id}.csv"
+
+def archive_run(weather_df, event_df, venue_df=None, path_prefix="output", run_time=None):
+    """
+    Keep a copy of the frames loaded by this run under archive/<date>/<time>_<table>.csv,
+    so BigQuery can be rebuilt later with backfill.py.
+    """
+    run_time = run_time or pd.Timestamp.now(tz="UTC")
+    weather_df.to_csv(archive_path("weather_forecast", path_prefix, run_time), index=False)
+    event_df.to_csv(archive_path("events_forecast", path_prefix, run_time), index=False)
+    if venue_df is not None:
+        venue_df.to_csv(archive_path("venues", path_prefix, run_time), index=False)
+
+def append_csv(df, path):
+    """
+    Append rows to a CSV file, writing the header only when the file is new.
+    """
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    df.to_csv(path, mode="a", header=write_header, index=False)
+
+def finalize_event_snapshot(delta_path, events_path, delta_ids, today=None, chunk_size=50000):
+    """
+    Complete a snapshot written chunk by chunk: delta_path already holds the changed events,
+    and the rows of the existing snapshot that are neither replaced nor past are appended
+    to it in chunks before it replaces events_path.
+
+    Returns:
+        Set of previous event dates of the replaced events
+    """
+    today = today or pd.Timestamp("today").normalize()
+    moved_dates = set()
+    try:
+        delta_columns = list(pd.read_csv(delta_path, nrows=0).columns)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        delta_columns = None
+
+    try:
+        existing_columns = list(pd.read_csv(events_path, nrows=0).columns)
+        # Same rule as merge_event_delta: snapshots of an older layout are rebuilt
+        if delta_columns is not None and not set(delta_columns) <= set(existing_columns):
+            existing_chunks = []
+        else:
+            existing_chunks = pd.read_csv(events_path, dtype={"event_id": str}, chunksize=chunk_size)
+        for chunk in existing_chunks:
+            replaced = chunk["event_id"].isin(delta_ids)
+            moved_dates |= set(pd.to_datetime(chunk.loc[replaced, "event_date"]).dt.date.unique())
+            keep = chunk[~replaced & (pd.to_datetime(chunk["event_date"]) >= today)]
+            append_csv(keep[delta_columns] if delta_columns is not None else keep, delta_path)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        pass
+
+    if os.path.exists(delta_path):
+        os.replace(delta_path, events_path)
+    return moved_dates
+
+def write_parquet_chunked(csv_path, parquet_path, arrow_schema, chunk_size=50000):
+    """
+    Convert a CSV output to Parquet one chunk at a time, with a fixed Arrow schema
+    so every row group has the same column types.
+    """
+    try:
+        columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    except pd.errors.EmptyDataError:
+        # A snapshot written by a run without events has no columns to convert
+        print(f"⚠️  {csv_path} is empty, skipping Parquet output")
+        return
+    schema = pa.schema([field for field in arrow_schema if field.name in columns])
+    string_columns = {field.name: str for field in schema if pa.types.is_string(field.type)}
+    tmp_path = f"{parquet_path}.tmp"
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for chunk in pd.read_csv(csv_path, dtype=string_columns, chunksize=chunk_size):
+            table = pa.Table.from_pandas(chunk[schema.names], preserve_index=False)
+            writer.write_table(table.cast(schema))
+    os.replace(tmp_path, parquet_path)
+
+def read_dates_chunked(csv_path, dates, date_column="event_date", chunk_size=50000):
+    """
+    Read only the rows of a CSV output whose date is in dates, one chunk at a time.
+    """
+    parts = []
+    for chunk in pd.read_csv(csv_path, dtype={"event_id": str}, chunksize=chunk_size):
+        parts.append(chunk[pd.to_datetime(chunk[date_column]).dt.date.isin(dates)])
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def save_to_csv(weather_df, event_df, venue_df=None, path_prefix="output"):
+    """
+    Write the CSV outputs and refresh the daily rollups of the dates touched by event_df.
+
+    Returns:
+        Tuple of (recomputed rollup rows, set of touched event dates)
+    """
     os.makedirs(path_prefix, exist_ok=True)
-    weather_df.to_csv(f"{path_prefix}/weather_forecast.csv", index=False)
-    event_df.to_csv(f"{path_prefix}/events_forecast.csv", index=False)
\ No newline at end of file
+    archive_run(weather_df, event_df, venue_df, path_prefix)
+    weather_path = f"{path_prefix}/weather_forecast.csv"
+    merge_weather(weather_df, weather_path).to_csv(weather_path, index=False)
+
+    events_path = f"{path_prefix}/events_forecast.csv"
+    try:
+        previous_df = pd.read_csv(events_path, dtype={"event_id": str})
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        previous_df = None
+    changed_dates = affected_dates(event_df, previous_df)
+    if "change_type" in event_df.columns or event_df.empty:
+        event_df = merge_event_delta(event_df, events_path)
+    event_df.to_csv(events_path, index=False)
+
+    # Only the rollup partitions of dates touched by this load are recomputed
+    rollups_path = f"{path_prefix}/daily_rollups.csv"
+    rollups_df, fresh_rollups = refresh_rollups(event_df, changed_dates, rollups_path)
+    rollups_df.to_csv(rollups_path, index=False)
+
+    if venue_df is not None:
+        venues_path = f"{path_prefix}/venues.csv"
+        merge_venues(venue_df, venues_path).to_csv(venues_path, index=False)
+
+    return fresh_rollups, changed_dates
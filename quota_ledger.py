@@ -0,0 +1,145 @@
+# quota_ledger.py
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+DEFAULT_LEDGER_PATH = os.getenv("API_QUOTA_LEDGER", "output/api_quota.sqlite")
+
+# Published limits of the plans we use, kept slightly below the hard caps.
+# OpenWeather's plan caps calls per minute (60) and has no per-second limit, so
+# concurrent weather lookups are only paced by the minute window.
+API_LIMITS = {
+    "ticketmaster": {"per_day": 4800, "per_second": 4},
+    "openweather": {"per_day": 950, "per_minute": 55},
+}
+
+
+class QuotaExceeded(Exception):
+    """Raised when an API's daily budget is spent."""
+
+
+class QuotaLedger:
+    """
+    Usage ledger shared by every process that calls the external APIs.
+
+    Each call is recorded in a SQLite table, so the daily, per-minute and
+    per-second budgets hold across concurrent workers and across runs.
+    """
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH, limits=None):
+        self.path = path
+        self.limits = limits or API_LIMITS
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS calls (api TEXT NOT NULL, ts REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS calls_api_ts ON calls (api, ts)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _day_start(now):
+        return datetime.fromtimestamp(now, timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ).timestamp()
+
+    def _wait_time(self, conn, api, n, now):
+        """
+        Return 0 if n calls fit now, else the seconds to wait. Raises QuotaExceeded
+        when the daily budget cannot fit them.
+        """
+        limits = self.limits.get(api, {})
+        windows = [("per_second", 1), ("per_minute", 60)]
+
+        if "per_day" in limits:
+            used = conn.execute(
+                "SELECT COUNT(*) FROM calls WHERE api = ? AND ts >= ?", (api, self._day_start(now))
+            ).fetchone()[0]
+            if used + n > limits["per_day"]:
+                raise QuotaExceeded(f"Daily {api} quota spent ({used}/{limits['per_day']} calls)")
+
+        wait = 0.0
+        for name, seconds in windows:
+            if name not in limits:
+                continue
+            rows = conn.execute(
+                "SELECT ts FROM calls WHERE api = ? AND ts > ? ORDER BY ts", (api, now - seconds)
+            ).fetchall()
+            overflow = min(len(rows) + n - limits[name], len(rows))
+            if overflow > 0:
+                # Wait until enough of the oldest calls leave the window
+                wait = max(wait, rows[overflow - 1][0] + seconds - now)
+        return wait
+
+    def reserve(self, api, n=1):
+        """
+        Block until n calls to api fit within its limits, then record them.
+        """
+        while True:
+            with self._connect() as conn:
+                # IMMEDIATE takes the write lock so two processes cannot reserve the same slot
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = time.time()
+                    wait = self._wait_time(conn, api, n, now)
+                    if wait <= 0:
+                        conn.executemany("INSERT INTO calls (api, ts) VALUES (?, ?)", [(api, now)] * n)
+                        conn.execute("DELETE FROM calls WHERE ts < ?", (now - 2 * 86400,))
+                        conn.execute("COMMIT")
+                        return
+                    conn.execute("ROLLBACK")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            time.sleep(wait)
+
+    def remaining(self, api):
+        """
+        Return how many calls to api are left today, or None if it has no daily limit.
+        """
+        limit = self.limits.get(api, {}).get("per_day")
+        if limit is None:
+            return None
+        with self._connect() as conn:
+            used = conn.execute(
+                "SELECT COUNT(*) FROM calls WHERE api = ? AND ts >= ?", (api, self._day_start(time.time()))
+            ).fetchone()[0]
+        return max(limit - used, 0)
+
+
+_ledger = None
+
+def get_ledger():
+    """
+    Return the process-wide ledger backed by DEFAULT_LEDGER_PATH.
+    """
+    global _ledger
+    if _ledger is None:
+        _ledger = QuotaLedger()
+    return _ledger
+
+
+def run_within_quota(func, items, max_workers=4):
+    """
+    Run func over items concurrently. Calls made inside func reserve their own
+    budget through the ledger, which paces the workers to the per-second and per-minute limits.
+
+    Returns:
+        List of (item, result_or_exception) in input order
+    """
+    def call(item):
+        try:
+            return item, func(item)
+        except Exception as e:
+            return item, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(call, items))
@@ -1,22 +1,43 @@
 # recommendation.py
+import numpy as np
+from venue_classifier import get_venue_classifier
 
-def calculate_comfort_level(temp, humidity, wind_speed, precipitation_chance):
+# Weather limits behind the comfort score; pass a modified copy to score what-if thresholds
+DEFAULT_THRESHOLDS = {
+    "cold_temp": 10,         # below this the temperature scores -1
+    "hot_temp": 30,          # above this the temperature scores -1
+    "ideal_temp_min": 15,    # ideal range scores +1
+    "ideal_temp_max": 25,
+    "rain_chance": 0.5,      # rain chance above this scores -1
+    "wind_speed": 10,        # wind speed (m/s) above this scores -1
+}
+
+# Comfort levels and recommendations in code order, as returned by the batch scorer
+COMFORT_LEVELS = ["Uncomfortable", "Moderate", "Comfortable"]
+RECOMMENDATIONS = [
+    "Not Recommended (Outdoor)", "Recommended (Indoor)",
+    "Recommended (Indoor OK)", "Recommended (Outdoor)",
+]
+
+def calculate_comfort_level(temp, humidity, wind_speed, precipitation_chance, thresholds=None):
     """
     Calculate comfort level based on temperature, humidity, wind speed, and rain chance.
     """
+    t = thresholds or DEFAULT_THRESHOLDS
+
     # Temperature score
-    if temp < 10 or temp > 30:
+    if temp < t["cold_temp"] or temp > t["hot_temp"]:
         temp_score = -1
-    elif 15 <= temp <= 25:
+    elif t["ideal_temp_min"] <= temp <= t["ideal_temp_max"]:
         temp_score = 1
     else:
         temp_score = 0
 
     # Rain score
-    rain_score = -1 if precipitation_chance > 0.5 else 0
+    rain_score = -1 if precipitation_chance > t["rain_chance"] else 0
 
     # Wind score
-    wind_score = -1 if wind_speed > 10 else 0
+    wind_score = -1 if wind_speed > t["wind_speed"] else 0
 
     # Total comfort score
     total_score = temp_score + rain_score + wind_score
@@ -28,18 +49,83 @@ def calculate_comfort_level(temp, humidity, wind_speed, precipitation_chance):
     else:
         return "Uncomfortable"
 
-def generate_recommendation(temp, feels_like, humidity, wind_speed, weather_main, precipitation_chance, venue_name):
+def generate_recommendation(temp, feels_like, humidity, wind_speed, weather_main, precipitation_chance, venue_name,
+                            thresholds=None):
     """
     Generate event recommendation based on today's weather conditions.
     """
-    comfort_level = calculate_comfort_level(temp, humidity, wind_speed, precipitation_chance)
+    comfort_level = calculate_comfort_level(temp, humidity, wind_speed, precipitation_chance, thresholds)
 
     if comfort_level == "Comfortable":
         return "Recommended (Outdoor)"
     elif comfort_level == "Moderate":
         return "Recommended (Indoor OK)"
     else:
-        if any(keyword in venue_name for keyword in ["Indoor", "Club", "Theater", "Theatre", "Center", "Auditorium", "Hall"]):
+        if get_venue_classifier().lookup(venue_name) == "indoor":
             return "Recommended (Indoor)"
         else:
-            return "Not Recommended (Outdoor)"
\ No newline at end of file
+            return "Not Recommended (Outdoor)"
+
+def indoor_venues(venue_names):
+    """
+    Return a boolean array telling which venues are indoor, from the cached venue classes.
+    """
+    return get_venue_classifier().lookup_many(venue_names) == "indoor"
+
+def comfort_scores(temp, wind_speed, precipitation_chance, thresholds=None):
+    """
+    Vectorized comfort score (temperature + rain + wind) for arrays of weather values.
+    Inputs broadcast against each other; a score >= 1 is comfortable, 0 moderate, below 0 uncomfortable.
+    """
+    t = thresholds or DEFAULT_THRESHOLDS
+    temp = np.asarray(temp, dtype=float)
+
+    temp_score = np.where(
+        (temp < t["cold_temp"]) | (temp > t["hot_temp"]), -1,
+        np.where((temp >= t["ideal_temp_min"]) & (temp <= t["ideal_temp_max"]), 1, 0)
+    )
+    rain_score = -(np.asarray(precipitation_chance, dtype=float) > t["rain_chance"]).astype(int)
+    wind_score = -(np.asarray(wind_speed, dtype=float) > t["wind_speed"]).astype(int)
+    return temp_score + rain_score + wind_score
+
+def score_scenarios(venue_names, temp, wind_speed, precipitation_chance, thresholds=None):
+    """
+    Score every event against every weather scenario in one vectorized pass.
+
+    Args:
+        venue_names: venue name of each of the n events
+        temp: temperatures of shape (n, s) for s scenarios per event, or (s,) shared by all events
+        wind_speed: wind speeds, broadcastable to (n, s)
+        precipitation_chance: rain chances (0-1), broadcastable to (n, s)
+        thresholds: comfort thresholds, DEFAULT_THRESHOLDS if omitted
+
+    Returns:
+        Dict of (n, s) arrays: "comfort_score" (int), "comfort_level" and "recommendation" (labels)
+    """
+    indoor = indoor_venues(venue_names)[:, None]
+    scores = comfort_scores(temp, wind_speed, precipitation_chance, thresholds)
+    scores = np.broadcast_to(scores, np.broadcast_shapes(scores.shape, (len(indoor), 1)))
+
+    # Codes index COMFORT_LEVELS and RECOMMENDATIONS
+    comfort_codes = np.clip(scores, -1, 1) + 1
+    recommendation_codes = np.where(comfort_codes == 0, indoor.astype(int), comfort_codes + 1)
+    return {
+        "comfort_score": scores,
+        "comfort_level": np.array(COMFORT_LEVELS, dtype=object)[comfort_codes],
+        "recommendation": np.array(RECOMMENDATIONS, dtype=object)[recommendation_codes],
+    }
+
+def recommendation_confidence(recommendations, reference=None):
+    """
+    Share of scenarios giving the same recommendation as the reference one.
+
+    Args:
+        recommendations: (n, s) recommendation labels from score_scenarios
+        reference: (n,) labels to compare with, the first scenario of each event if omitted
+
+    Returns:
+        (n,) array of shares between 0 and 1
+    """
+    recommendations = np.asarray(recommendations, dtype=object)
+    reference = recommendations[:, 0] if reference is None else np.asarray(reference, dtype=object)
+    return (recommendations == reference[:, None]).mean(axis=1)
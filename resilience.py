@@ -0,0 +1,213 @@
+# resilience.py
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from quota_ledger import QuotaExceeded
+
+# Per-endpoint behaviour. timeout is the requests (connect, read) timeout; the breaker opens
+# after failure_threshold consecutive failures and lets a probe through after reset_seconds.
+# Hedged endpoints send a duplicate request when the first one outlives the recent p95 latency.
+DEFAULT_POLICY = {
+    "timeout": (3.05, 10),
+    "failure_threshold": 3,
+    "reset_seconds": 60,
+    "hedge": False,
+    "hedge_quantile": 95,
+    "hedge_min_samples": 20,
+    "hedge_min_delay": 0.5,
+}
+
+ENDPOINT_POLICIES = {
+    "ticketmaster:events": {"timeout": (3.05, 15), "failure_threshold": 2, "reset_seconds": 120},
+    "openweather:weather": {"hedge": True},
+    "openweather:forecast": {"hedge": True},
+}
+
+# Number of recent latencies and cached responses kept per endpoint
+LATENCY_WINDOW = 200
+CACHE_SIZE = 512
+
+# Threads running primary and hedged requests
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+class CircuitOpen(Exception):
+    """Raised when an endpoint is flagged unhealthy and there is no cached response to serve."""
+
+
+class EndpointGuard:
+    """
+    Circuit breaker, latency tracker and last-response cache for one endpoint.
+
+    A closed circuit passes every call. After failure_threshold consecutive failures the
+    circuit opens: calls fail fast and are answered from the cache until reset_seconds
+    have passed, when a single probe call decides whether to close it again.
+    """
+
+    def __init__(self, endpoint, policy=None):
+        self.endpoint = endpoint
+        self.policy = {**DEFAULT_POLICY, **(policy or ENDPOINT_POLICIES.get(endpoint, {}))}
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        return self.policy["timeout"]
+
+    def _allow(self):
+        # Closed circuits pass; open ones let exactly one probe through once the reset time is up
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.time() - self.opened_at >= self.policy["reset_seconds"]:
+                self.probing = True
+                return True
+            return False
+
+    def _record_success(self, key, result, latency):
+        with self.lock:
+            if self.opened_at is not None:
+                print(f"✅ {self.endpoint} recovered, closing circuit")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            self.latencies.append(latency)
+            if key is not None:
+                self.cache[key] = result
+                self.cache.move_to_end(key)
+                while len(self.cache) > CACHE_SIZE:
+                    self.cache.popitem(last=False)
+
+    def _record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.policy["failure_threshold"]:
+                if self.opened_at is None or self.probing:
+                    print(f"⚠️  {self.endpoint} unhealthy after {self.failures} failure(s), opening circuit")
+                self.opened_at = time.time()
+            self.probing = False
+
+    def _release_probe(self):
+        # A call that never reached the endpoint leaves the next probe to someone else
+        with self.lock:
+            self.probing = False
+
+    def _cached(self, key):
+        with self.lock:
+            return self.cache.get(key) if key is not None else None
+
+    def hedge_delay(self):
+        """
+        Return how long to wait before sending a duplicate request, or None if hedging is off
+        or there are not enough latency samples yet.
+        """
+        if not self.policy["hedge"]:
+            return None
+        with self.lock:
+            if len(self.latencies) < self.policy["hedge_min_samples"]:
+                return None
+            p = np.percentile(self.latencies, self.policy["hedge_quantile"])
+        return max(float(p), self.policy["hedge_min_delay"])
+
+    @staticmethod
+    def _attempt(request_fn, reserve=None):
+        # Waiting for quota is not endpoint latency, so the clock starts after the reservation
+        if reserve is not None:
+            reserve()
+        start = time.monotonic()
+        return request_fn(), time.monotonic() - start
+
+    def _run_hedged(self, request_fn, reserve):
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._attempt(request_fn)
+
+        primary = _executor.submit(self._attempt, request_fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        # The first request is slower than usual; race a duplicate, which books its own quota,
+        # and keep whichever answers first
+        pending = {primary, _executor.submit(self._attempt, request_fn, reserve)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                # A duplicate that got no quota says nothing about the endpoint
+                if error is None or isinstance(error, QuotaExceeded):
+                    error = future.exception()
+        raise error
+
+    def call(self, request_fn, cache_key=None, reserve=None):
+        """
+        Run request_fn through the breaker.
+
+        Args:
+            request_fn: zero-argument callable performing the request and returning its parsed result
+            cache_key: hashable identity of the request; successful results are cached under it
+                       and served while the endpoint is unhealthy
+            reserve: zero-argument callable booking quota for one request, e.g. a quota ledger
+                     reservation; called before the request is timed, and again for a hedged duplicate
+
+        Returns:
+            The fresh result, or the last cached result for cache_key when the endpoint is failing
+        """
+        if not self._allow():
+            cached = self._cached(cache_key)
+            if cached is not None:
+                print(f"↩️  {self.endpoint} circuit open, serving cached response")
+                return cached
+            raise CircuitOpen(f"{self.endpoint} circuit open and no cached response")
+
+        try:
+            if reserve is not None:
+                reserve()
+            result, latency = self._run_hedged(request_fn, reserve)
+        except QuotaExceeded:
+            # Our own budget is spent; the endpoint is not unhealthy
+            self._release_probe()
+            cached = self._cached(cache_key)
+            if cached is not None:
+                print(f"↩️  {self.endpoint} quota spent, serving cached response")
+                return cached
+            raise
+        except Exception:
+            self._record_failure()
+            cached = self._cached(cache_key)
+            if cached is not None:
+                print(f"↩️  {self.endpoint} request failed, serving cached response")
+                return cached
+            raise
+        self._record_success(cache_key, result, latency)
+        return result
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+def get_guard(endpoint):
+    """
+    Return the process-wide guard of an endpoint, creating it on first use.
+    """
+    with _guards_lock:
+        if endpoint not in _guards:
+            _guards[endpoint] = EndpointGuard(endpoint)
+        return _guards[endpoint]
+
+
+def request_key(params, secret_keys=("apikey", "appid")):
+    """
+    Build a cache key from request params, leaving out API keys.
+    """
+    return tuple(sorted((k, str(v)) for k, v in params.items() if k not in secret_keys))
@@ -0,0 +1,82 @@
+# rollups.py
+import pandas as pd
+
+ROLLUP_KEYS = ["event_date", "category", "recommendation"]
+
+ROLLUP_COLUMNS = ROLLUP_KEYS + [
+    "event_count", "paid_count", "free_count", "priced_count",
+    "price_min_avg", "price_min_p25", "price_min_p50", "price_min_p75", "price_max_max",
+]
+
+
+def compute_daily_rollups(event_df):
+    """
+    Aggregate events into one row per (event_date, category, recommendation)
+    with counts, the paid/free split and the price distribution.
+    """
+    if event_df.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    df = event_df.assign(
+        event_date=pd.to_datetime(event_df["event_date"]).dt.date,
+        is_paid=(event_df["free_or_paid"] == "Paid").astype(int),
+    )
+    grouped = df.groupby(ROLLUP_KEYS, dropna=False)
+    rollups = grouped.agg(
+        event_count=("event_name", "size"),
+        paid_count=("is_paid", "sum"),
+        priced_count=("price_min", "count"),
+        price_min_avg=("price_min", "mean"),
+        price_max_max=("price_max", "max"),
+    )
+    rollups["free_count"] = rollups["event_count"] - rollups["paid_count"]
+    quantiles = grouped["price_min"].quantile([0.25, 0.5, 0.75]).unstack()
+    rollups["price_min_p25"] = quantiles[0.25]
+    rollups["price_min_p50"] = quantiles[0.5]
+    rollups["price_min_p75"] = quantiles[0.75]
+    return rollups.reset_index()[ROLLUP_COLUMNS]
+
+
+def affected_dates(event_df, previous_df=None):
+    """
+    Return the event dates touched by a load; only these rollup partitions are recomputed.
+    When the previous snapshot is given, the old dates of rescheduled events count as touched too.
+    """
+    if event_df.empty or "event_date" not in event_df.columns:
+        return set()
+    dates = set(pd.to_datetime(event_df["event_date"]).dt.date.unique())
+    if previous_df is not None and not previous_df.empty and "event_id" in previous_df.columns:
+        moved = previous_df[previous_df["event_id"].isin(event_df["event_id"])]
+        dates |= set(pd.to_datetime(moved["event_date"]).dt.date.unique())
+    return dates
+
+
+def refresh_rollups(snapshot_df, dates, rollups_path):
+    """
+    Recompute the rollups of the given dates from the current events snapshot
+    and merge them into the rollups CSV, leaving other dates untouched.
+
+    Args:
+        snapshot_df: current events snapshot (all live events, not just the delta)
+        dates: event dates whose rollups changed
+        rollups_path: path of the rollups CSV
+
+    Returns:
+        Tuple of (full rollups table, rows recomputed for the given dates)
+    """
+    dates = set(dates)
+    if snapshot_df.empty:
+        fresh = compute_daily_rollups(snapshot_df)
+    else:
+        fresh = compute_daily_rollups(snapshot_df[pd.to_datetime(snapshot_df["event_date"]).dt.date.isin(dates)])
+
+    try:
+        existing = pd.read_csv(rollups_path)
+        existing["event_date"] = pd.to_datetime(existing["event_date"]).dt.date
+        existing = existing[~existing["event_date"].isin(dates)]
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        existing = pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    merged = pd.concat([existing, fresh], ignore_index=True) if not existing.empty else fresh
+    merged = merged.sort_values(ROLLUP_KEYS, kind="stable").reset_index(drop=True)
+    return merged, fresh
@@ -0,0 +1,238 @@
+# scheduler.py
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from etl_pipeline import etl_pipeline
+from quota_ledger import get_ledger
+
+STATE_PATH = "output/scheduler_state.json"
+HORIZON_DAYS = 5
+
+# Near-term days change fast; later days rarely do
+REFRESH_INTERVALS = {
+    0: timedelta(minutes=15),
+    1: timedelta(hours=1),
+}
+DEFAULT_REFRESH_INTERVAL = timedelta(hours=6)
+
+# Slice refreshes allowed per rolling hour across all cities, to stay within the API quotas
+DEFAULT_SLICES_PER_HOUR = 20
+
+# Rough API calls spent by one city refresh, however many of its days are due: one
+# Ticketmaster call per classification, two OpenWeather calls per occupied grid cell
+REFRESH_API_COST = {"ticketmaster": 5, "openweather": 20}
+
+# A failed slice is retried after a backoff that doubles with each consecutive failure
+FAILURE_BACKOFF = timedelta(minutes=5)
+MAX_FAILURE_BACKOFF = timedelta(hours=6)
+
+# Scheduled refreshes push the CSV outputs to GitHub at most this often; every push is a commit
+DEFAULT_PUBLISH_INTERVAL = timedelta(hours=3)
+
+
+def refresh_interval(day_offset):
+    """
+    Return how often the slice for a given day offset should be refreshed.
+    """
+    return REFRESH_INTERVALS.get(day_offset, DEFAULT_REFRESH_INTERVAL)
+
+
+def slice_key(city, day_offset):
+    return f"{city}|{day_offset}"
+
+
+def load_state(path=STATE_PATH):
+    """
+    Load the last refresh time of each (city, day) slice, the recent refresh log,
+    the failure backoff of each failing slice and the time of the last GitHub publish.
+    """
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        state = {}
+    state.setdefault("last_refresh", {})
+    state.setdefault("recent_runs", [])
+    state.setdefault("failures", {})
+    state.setdefault("last_publish", None)
+    return state
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def due_slices(cities, state, now):
+    """
+    Return the (city, day_offset) slices due for a refresh, most urgent first.
+
+    Urgency is how far a slice is past its interval (elapsed / interval), so a
+    15-minute slice that is 30 minutes old outranks a 6-hour slice that is 7 hours old.
+    Slices never refreshed come first; ties go to the nearer day. Failed slices
+    wait for their backoff to pass.
+    """
+    due = []
+    for city in cities:
+        for day_offset in range(HORIZON_DAYS):
+            failure = state["failures"].get(slice_key(city, day_offset))
+            if failure is not None and datetime.fromisoformat(failure["retry_at"]) > now:
+                continue
+            interval = refresh_interval(day_offset)
+            last = state["last_refresh"].get(slice_key(city, day_offset))
+            if last is None:
+                urgency = float("inf")
+            else:
+                elapsed = now - datetime.fromisoformat(last)
+                if elapsed < interval:
+                    continue
+                urgency = elapsed / interval
+            due.append((urgency, day_offset, city))
+
+    due.sort(key=lambda item: (-item[0], item[1]))
+    return [(city, day_offset) for _, day_offset, city in due]
+
+
+def remaining_budget(state, now, slices_per_hour):
+    """
+    Return how many slice refreshes are left in the rolling hour and prune older entries.
+    """
+    hour_ago = now - timedelta(hours=1)
+    state["recent_runs"] = [ts for ts in state["recent_runs"] if datetime.fromisoformat(ts) > hour_ago]
+    return max(slices_per_hour - len(state["recent_runs"]), 0)
+
+
+def fits_daily_quota(ledger):
+    """
+    Return True if the quota ledger has room today for one more city refresh.
+    """
+    for api, cost in REFRESH_API_COST.items():
+        remaining = ledger.remaining(api)
+        if remaining is not None and remaining < cost:
+            print(f"⏳ Daily {api} quota nearly spent ({remaining} calls left), deferring refreshes")
+            return False
+    return True
+
+
+def failure_backoff(failures):
+    """
+    Return how long a slice waits after its given number of consecutive failures.
+    """
+    return min(FAILURE_BACKOFF * 2 ** (failures - 1), MAX_FAILURE_BACKOFF)
+
+
+def record_failure(state, city, day_offsets, now):
+    """
+    Back off the failed slices of a city and return when they are retried.
+    """
+    retry_at = now
+    for day_offset in day_offsets:
+        key = slice_key(city, day_offset)
+        failures = state["failures"].get(key, {}).get("count", 0) + 1
+        retry_at = now + failure_backoff(failures)
+        state["failures"][key] = {"count": failures, "retry_at": retry_at.isoformat()}
+    return retry_at
+
+
+def publish_due(state, now, publish_interval):
+    """
+    Return True if the CSV outputs were last pushed to GitHub at least publish_interval ago.
+    """
+    if not publish_interval:
+        return False
+    last = state["last_publish"]
+    return last is None or now - datetime.fromisoformat(last) >= publish_interval
+
+
+def group_by_city(slices):
+    """
+    Group (city, day_offset) slices into city -> sorted day offsets, cities in order of
+    their most urgent slice.
+    """
+    grouped = {}
+    for city, day_offset in slices:
+        grouped.setdefault(city, []).append(day_offset)
+    return {city: sorted(day_offsets) for city, day_offsets in grouped.items()}
+
+
+def run_tick(cities, slices_per_hour=DEFAULT_SLICES_PER_HOUR, state_path=STATE_PATH,
+             publish_interval=DEFAULT_PUBLISH_INTERVAL):
+    """
+    Refresh the most urgent due slices that fit in the remaining hourly budget
+    and in the daily API quotas recorded by the quota ledger.
+
+    The due slices of a city are refreshed together in one run, so its events and
+    weather are fetched and loaded once per tick rather than once per slice. Every
+    attempt counts against the hourly budget, and failed slices back off. The CSV
+    outputs are pushed to GitHub at most once per publish_interval (never if it is None).
+    """
+    ledger = get_ledger()
+    state = load_state(state_path)
+    now = datetime.now(timezone.utc)
+    due = due_slices(cities, state, now)
+    budget = remaining_budget(state, now, slices_per_hour)
+    if due and budget == 0:
+        print(f"⏳ {len(due)} slice(s) due but the hourly budget is spent")
+
+    groups = list(group_by_city(due[:budget]).items())
+    for position, (city, day_offsets) in enumerate(groups):
+        if not fits_daily_quota(ledger):
+            break
+        days = ", ".join(f"+{day_offset}" for day_offset in day_offsets)
+        started = datetime.now(timezone.utc)
+        # The tick's last refresh publishes, so the upload carries every city refreshed before it
+        publish = position == len(groups) - 1 and publish_due(state, started, publish_interval)
+        print(f"🔄 Refreshing {city} day(s) {days}{' and publishing to GitHub' if publish else ''}")
+        # Attempts spend API calls whether or not they succeed
+        state["recent_runs"].extend([started.isoformat()] * len(day_offsets))
+        if publish:
+            state["last_publish"] = started.isoformat()
+        try:
+            etl_pipeline(city=city, day_offsets=day_offsets, publish_github=publish)
+        except Exception as e:
+            retry_at = record_failure(state, city, day_offsets, datetime.now(timezone.utc))
+            print(f"❌ Refresh of {city} day(s) {days} failed, retrying after {retry_at:%H:%M} UTC: {str(e)}")
+            save_state(state, state_path)
+            continue
+        finished = datetime.now(timezone.utc).isoformat()
+        for day_offset in day_offsets:
+            state["last_refresh"][slice_key(city, day_offset)] = finished
+            state["failures"].pop(slice_key(city, day_offset), None)
+        save_state(state, state_path)
+
+
+def run_scheduler(cities, slices_per_hour=DEFAULT_SLICES_PER_HOUR, tick_seconds=60,
+                  publish_interval=DEFAULT_PUBLISH_INTERVAL):
+    """
+    Run forever, refreshing each (city, day) slice on its own interval.
+    """
+    print(f"Starting tiered scheduler for {', '.join(cities)}")
+    while True:
+        run_tick(cities, slices_per_hour, publish_interval=publish_interval)
+        time.sleep(tick_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiered refresh scheduler for the weather & event ETL")
+    parser.add_argument("--cities", default=os.getenv("ETL_CITIES", "New York"),
+                        help="Comma-separated list of cities")
+    parser.add_argument("--slices-per-hour", type=int, default=DEFAULT_SLICES_PER_HOUR)
+    parser.add_argument("--tick-seconds", type=int, default=60)
+    parser.add_argument("--publish-hours", type=float,
+                        default=DEFAULT_PUBLISH_INTERVAL.total_seconds() / 3600,
+                        help="Push the CSV outputs to GitHub at most this often (0 to never push)")
+    parser.add_argument("--once", action="store_true", help="Run a single tick and exit")
+    args = parser.parse_args()
+
+    cities = [city.strip() for city in args.cities.split(",") if city.strip()]
+    publish_interval = timedelta(hours=args.publish_hours) if args.publish_hours > 0 else None
+    if args.once:
+        run_tick(cities, args.slices_per_hour, publish_interval=publish_interval)
+    else:
+        run_scheduler(cities, args.slices_per_hour, args.tick_seconds, publish_interval)
@@ -0,0 +1,88 @@
+# search_index.py
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Event columns whose words can be searched
+SEARCH_COLUMNS = ["event_name", "venue", "category"]
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """
+    Split text into lowercase word tokens.
+    """
+    if text is None or (isinstance(text, float) and pd.isna(text)):
+        return []
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def build_search_index(event_df, columns=SEARCH_COLUMNS):
+    """
+    Build an inverted index from tokens to the row positions of event_df containing them.
+
+    Args:
+        event_df: events to index
+        columns: text columns to tokenize; missing columns are skipped
+
+    Returns:
+        Dict with the sorted token list and, for each token, a sorted array of row positions
+    """
+    postings = defaultdict(set)
+    for column in columns:
+        if column not in event_df.columns:
+            continue
+        # Repeated values (venues, categories) are tokenized once
+        positions = pd.Series(np.arange(len(event_df)))
+        for value, rows in positions.groupby(event_df[column].to_numpy()).groups.items():
+            rows = rows.tolist()
+            for token in tokenize(value):
+                postings[token].update(rows)
+
+    tokens = sorted(postings)
+    return {
+        "tokens": tokens,
+        "postings": [np.fromiter(sorted(postings[token]), dtype=np.int64) for token in tokens],
+        "size": len(event_df),
+    }
+
+
+def _prefix_matches(index, prefix):
+    # Tokens sharing a prefix are contiguous in the sorted token list
+    tokens = index["tokens"]
+    start = bisect_left(tokens, prefix)
+    end = bisect_left(tokens, prefix + "\U0010ffff", lo=start)
+    if start == end:
+        return np.empty(0, dtype=np.int64)
+    if end - start == 1:
+        return index["postings"][start]
+    return np.unique(np.concatenate(index["postings"][start:end]))
+
+
+def search_events(index, query):
+    """
+    Return the row positions of events matching every word of the query, each as a prefix.
+
+    Args:
+        index: index from build_search_index
+        query: free text typed by the user
+
+    Returns:
+        Sorted array of row positions; all rows when the query has no words
+    """
+    terms = tokenize(query)
+    if not terms:
+        return np.arange(index["size"])
+
+    matches = None
+    # Longer terms are more selective, so they narrow the result first
+    for term in sorted(set(terms), key=len, reverse=True):
+        rows = _prefix_matches(index, term)
+        matches = rows if matches is None else np.intersect1d(matches, rows, assume_unique=True)
+        if len(matches) == 0:
+            break
+    return matches
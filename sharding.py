@@ -0,0 +1,229 @@
+# sharding.py
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+from prefect import flow
+
+from change_detection import load_fingerprint_index
+from etl_pipeline import extract_data, transform_frames, load, save_fingerprints, check_sink_results
+from scheduler import HORIZON_DAYS
+
+# Fingerprint index snapshot shared by every city extract of a run, set once per worker process
+_worker_index = None
+
+
+def frame_to_ipc(df):
+    """
+    Serialize a DataFrame to an Arrow IPC stream.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_to_frame(buffer):
+    """
+    Read a DataFrame back from an Arrow IPC stream.
+    """
+    return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+
+def _init_worker(fingerprint_index):
+    global _worker_index
+    _worker_index = fingerprint_index
+
+
+def extract_city(city, day_offsets):
+    """
+    Extract one city in a worker process: its events and the weather of its cells are
+    fetched once for all of its days, then compared against the fingerprint index.
+
+    Returns:
+        Tuple of (city, weather IPC bytes, events IPC bytes, changed index entries)
+    """
+    weather_data, event_delta, new_index = extract_data(city, day_offsets, _worker_index)
+
+    # Only the entries this city wrote travel back; the parent already holds the rest
+    changed = {key: entry for key, entry in new_index.items() if _worker_index.get(key) != entry}
+    return city, frame_to_ipc(weather_data), frame_to_ipc(pd.DataFrame(event_delta)), changed
+
+
+def split_by_day(weather_ipc, events_ipc):
+    """
+    Split the extracted frames of a city into one (weather IPC, events IPC) pair per day.
+
+    Returns:
+        Dict of day -> (weather IPC bytes, events IPC bytes)
+    """
+    weather_df, event_df = ipc_to_frame(weather_ipc), ipc_to_frame(events_ipc)
+    weather_days = pd.to_datetime(weather_df["date"]).dt.date if not weather_df.empty else pd.Series(dtype=object)
+    event_days = pd.to_datetime(event_df["event_date"]).dt.date if not event_df.empty else pd.Series(dtype=object)
+
+    days = {}
+    for day in sorted(set(weather_days) | set(event_days)):
+        days[day] = (
+            frame_to_ipc(weather_df[(weather_days == day).to_numpy()] if not weather_df.empty else weather_df),
+            frame_to_ipc(event_df[(event_days == day).to_numpy()] if not event_df.empty else event_df),
+        )
+    return days
+
+
+def run_shard(city, day, weather_ipc, events_ipc):
+    """
+    Transform and validate one (city, day) slice of an extracted city in a worker process.
+
+    Returns:
+        Tuple of (city, day, weather IPC bytes, events IPC bytes)
+    """
+    weather_data, event_delta = ipc_to_frame(weather_ipc), ipc_to_frame(events_ipc)
+    if len(weather_data) == 0 and len(event_delta) == 0:
+        weather_df, event_df = pd.DataFrame(), pd.DataFrame()
+    else:
+        weather_df, event_df = transform_frames(weather_data, event_delta)
+    return city, day, frame_to_ipc(weather_df), frame_to_ipc(event_df)
+
+
+def merge_shards(results, base_index, changed_by_city=None, today=None):
+    """
+    Combine shard outputs in (city, day) order, and the index entries of each city in city
+    order, so the merged frames and index do not depend on which worker finished first.
+
+    Returns:
+        Tuple of (weather_df, event_df, fingerprint index)
+    """
+    today = today or pd.Timestamp("today").date()
+    index = {
+        key: entry for key, entry in base_index.items()
+        if pd.to_datetime(entry[1]).date() >= today
+    }
+    for city in sorted(changed_by_city or {}):
+        index.update(changed_by_city[city])
+
+    weather_frames, event_frames = [], []
+    ordered = sorted(results, key=lambda r: (r[0], r[1]))
+    for shard, (city, day, weather_ipc, events_ipc) in enumerate(ordered):
+        weather_frames.append(ipc_to_frame(weather_ipc).assign(_shard=shard))
+        event_frames.append(ipc_to_frame(events_ipc))
+
+    weather_frames = [df for df in weather_frames if not df.empty]
+    event_frames = [df for df in event_frames if not df.empty]
+    weather_df = pd.concat(weather_frames, ignore_index=True) if weather_frames else pd.DataFrame()
+    event_df = pd.concat(event_frames, ignore_index=True) if event_frames else pd.DataFrame()
+
+    # Neighbouring cities can return the same event or share a weather cell. A shared cell
+    # keeps every row of the first shard that fetched it: today has both a current-weather
+    # and a noon-forecast row per cell, as in the single-process output
+    if not weather_df.empty:
+        first_shard = weather_df.groupby(["cell_id", "date"])["_shard"].transform("min")
+        weather_df = (
+            weather_df[weather_df["_shard"] == first_shard]
+            .drop(columns="_shard")
+            .sort_values(["cell_id", "date"], kind="stable")
+            .reset_index(drop=True)
+        )
+    if not event_df.empty:
+        event_df = (
+            event_df.drop_duplicates(subset=["event_id"], keep="first")
+            .sort_values(["event_date", "event_time", "event_id"], kind="stable")
+            .reset_index(drop=True)
+        )
+    return weather_df, event_df, index
+
+
+def run_shards(cities, day_offsets, max_workers=None):
+    """
+    Extract each city once across a process pool, then transform and validate its
+    (city, day) shards on the same pool and merge the results.
+
+    Args:
+        cities: list of city names
+        day_offsets: days ahead to refresh for each city
+        max_workers: number of worker processes (defaults to the CPU count)
+
+    Returns:
+        Tuple of (weather_df, event_df, fingerprint index)
+    """
+    base_index = load_fingerprint_index()
+    max_workers = max_workers or os.cpu_count()
+    print(f"Extracting {len(cities)} city(ies) on {max_workers} worker process(es)")
+
+    results, changed_by_city, failures = [], {}, []
+    # Spawned workers do not inherit the parent's threads, sessions or SQLite handles
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=_init_worker, initargs=(base_index,)) as executor:
+        extracts = {executor.submit(extract_city, city, day_offsets): city for city in cities}
+        shards = {}
+        # API calls happen once per city; only the CPU-bound transform is split by day
+        for future in as_completed(extracts):
+            city = extracts[future]
+            try:
+                _, weather_ipc, events_ipc, changed = future.result()
+            except Exception as e:
+                failures.append(city)
+                print(f"❌ Extract of {city} failed: {str(e)}")
+                continue
+            changed_by_city[city] = changed
+            for day, (day_weather, day_events) in split_by_day(weather_ipc, events_ipc).items():
+                shards[executor.submit(run_shard, city, day, day_weather, day_events)] = (city, day)
+            print(f"✅ Extract of {city} done")
+
+        for future in as_completed(shards):
+            city, day = shards[future]
+            try:
+                results.append(future.result())
+                print(f"✅ Shard {city} {day} done")
+            except Exception as e:
+                failures.append(f"{city} {day}")
+                print(f"❌ Shard {city} {day} failed: {str(e)}")
+
+    if failures:
+        raise Exception(f"Shards failed: {', '.join(sorted(failures))}")
+    return merge_shards(results, base_index, changed_by_city)
+
+
+@flow(name="Sharded ETL Pipeline")
+def sharded_etl_pipeline(cities: Optional[list] = None, day_offsets: Optional[list] = None,
+                         max_workers: Optional[int] = None):
+    """
+    Run the ETL for several cities over a process pool: one extract per city, then one
+    transform and validation shard per (city, day). Loading is shared with etl_pipeline.
+    """
+    cities = cities or ["New York"]
+    day_offsets = day_offsets if day_offsets is not None else list(range(HORIZON_DAYS))
+    weather_df, event_df, fingerprint_index = run_shards(cities, day_offsets, max_workers)
+
+    if weather_df.empty:
+        print("No data extracted, nothing to load")
+        return
+
+    sink_results = load(weather_df, event_df)
+
+    # Same rule as etl_pipeline: the delta is only consumed once the key sinks have it
+    if all(sink_results[name] for name in [
+        "csv", "bigquery:events_forecast", "bigquery:venues", "bigquery:daily_rollups"
+    ]):
+        save_fingerprints(fingerprint_index)
+
+    check_sink_results(sink_results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the ETL sharded by city and day across processes")
+    parser.add_argument("--cities", default="New York", help="Comma-separated city names")
+    parser.add_argument("--days", default=None, help="Comma-separated day offsets (default: all)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    sharded_etl_pipeline(
+        cities=[c.strip() for c in args.cities.split(",") if c.strip()],
+        day_offsets=[int(d) for d in args.days.split(",")] if args.days else None,
+        max_workers=args.workers,
+    )
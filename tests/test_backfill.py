@@ -0,0 +1,23 @@
+import pandas as pd
+
+from backfill import list_archived_files, read_archived_table
+from bigquery_utils import row_keys
+from load import archive_run
+
+
+def test_archived_event_delta_keeps_the_loaded_at_sent_to_bigquery(tmp_path):
+    delta = pd.DataFrame({
+        "event_id": ["e1", "e2"],
+        "event_name": ["Jazz Night", "Open Air Cinema"],
+        "event_date": pd.to_datetime(["2025-06-01", "2025-06-02"]),
+        "change_type": ["insert", "update"],
+        "loaded_at": pd.Timestamp("2025-06-01 06:00:00.123", tz="UTC"),
+    })
+    # The archive file is named after the run's second-resolution time, not loaded_at
+    archive_run(pd.DataFrame(), delta, path_prefix=str(tmp_path), run_time=pd.Timestamp("2025-06-01 06:00:03", tz="UTC"))
+
+    files = list_archived_files(pd.Timestamp("2025-06-01").date(), pd.Timestamp("2025-06-01").date(),
+                                "events_forecast.csv", str(tmp_path / "archive"))
+    archived = read_archived_table("events_forecast", files)
+
+    assert row_keys(archived, "events_forecast").tolist() == row_keys(delta, "events_forecast").tolist()
@@ -0,0 +1,181 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import bigquery_utils
+from bigquery_utils import normalize_sql, row_keys, update_bigquery_data, update_bigquery_table
+
+
+class FakeBigQueryClient:
+    """
+    Keeps loaded frames in memory; only the calls made by update_bigquery_table are supported.
+    """
+
+    project = "test"
+
+    def __init__(self):
+        self.tables = {}
+        self.labels = {}
+
+    def load_table_from_dataframe(self, df, destination, job_config=None):
+        table_id = destination.split(".")[-1]
+        self.tables[table_id] = pd.concat([self.tables.get(table_id), df], ignore_index=True)
+        return SimpleNamespace(result=lambda: None)
+
+    def get_table(self, name):
+        return SimpleNamespace(num_rows=len(self.tables.get(name.split(".")[-1], [])))
+
+    def get_dataset(self, dataset_id):
+        return SimpleNamespace(labels=dict(self.labels))
+
+    def update_dataset(self, dataset, fields):
+        self.labels = dataset.labels
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeBigQueryClient()
+
+    # Answer the key lookup from the loaded frames instead of SQL
+    def existing_row_keys(client, table_id, keys, dataset_id="weather_events"):
+        if table_id not in client.tables:
+            return set()
+        return set(row_keys(client.tables[table_id], table_id)) & set(keys)
+
+    def latest_venue_hashes(client, venue_ids, dataset_id="weather_events"):
+        venues = client.tables.get("venues")
+        if venues is None:
+            return {}
+        latest = venues.sort_values("loaded_at", kind="stable").drop_duplicates(subset=["venue_id"], keep="last")
+        return dict(zip(latest["venue_id"], latest["attributes_hash"]))
+
+    monkeypatch.setattr(bigquery_utils, "existing_row_keys", existing_row_keys)
+    monkeypatch.setattr(bigquery_utils, "latest_venue_hashes", latest_venue_hashes)
+    return client
+
+
+def weather_rows(cell_id, dates, temperature, fetched_at="2025-06-01 06:00"):
+    return pd.DataFrame({
+        "date": pd.to_datetime(dates),
+        "cell_id": cell_id,
+        "temperature_celsius": temperature,
+        "fetched_at": pd.Timestamp(fetched_at, tz="UTC"),
+    })
+
+
+def test_second_cell_on_loaded_date_is_inserted(client):
+    update_bigquery_table(weather_rows("407:-741", ["2025-06-01", "2025-06-02"], 20.0), "weather_forecast", client=client)
+    update_bigquery_table(weather_rows("408:-740", ["2025-06-01"], 18.0), "weather_forecast", client=client)
+
+    loaded = client.tables["weather_forecast"]
+    assert sorted(zip(loaded["cell_id"], loaded["date"].dt.strftime("%Y-%m-%d"))) == [
+        ("407:-741", "2025-06-01"), ("407:-741", "2025-06-02"), ("408:-740", "2025-06-01"),
+    ]
+
+
+def test_retried_load_does_not_duplicate_rows(client):
+    rows = weather_rows("407:-741", ["2025-06-01"], 20.0)
+    update_bigquery_table(rows, "weather_forecast", client=client)
+    update_bigquery_table(rows, "weather_forecast", client=client)
+
+    assert len(client.tables["weather_forecast"]) == 1
+
+
+def test_refreshed_forecast_is_loaded_as_a_new_version(client):
+    update_bigquery_table(weather_rows("407:-741", ["2025-06-01"], 20.0), "weather_forecast", client=client)
+    update_bigquery_table(
+        weather_rows("407:-741", ["2025-06-01"], 23.5, fetched_at="2025-06-01 12:15"),
+        "weather_forecast", client=client,
+    )
+
+    loaded = client.tables["weather_forecast"]
+    assert loaded["temperature_celsius"].tolist() == [20.0, 23.5]
+    assert loaded["fetched_at"].is_unique
+
+
+def test_retried_event_delta_load_does_not_duplicate_rows(client):
+    delta = pd.DataFrame({
+        "event_id": ["e1", "e2"],
+        "event_name": ["Jazz Night", "Open Air Cinema"],
+        "event_date": pd.to_datetime(["2025-06-01", "2025-06-02"]),
+        "change_type": ["insert", "update"],
+        "loaded_at": pd.Timestamp("2025-06-01 06:00", tz="UTC"),
+    })
+    update_bigquery_table(delta, "events_forecast", client=client)
+    # A retry after a load that committed but timed out sends the same rows again
+    update_bigquery_table(delta, "events_forecast", client=client)
+    update_bigquery_table(delta.assign(loaded_at=pd.Timestamp("2025-06-01 12:00", tz="UTC")), "events_forecast", client=client)
+
+    assert len(client.tables["events_forecast"]) == 4
+
+
+def test_storage_write_path_skips_loaded_rows(client, monkeypatch):
+    monkeypatch.setattr(bigquery_utils, "BQ_WRITE_METHOD", "storage_write")
+    monkeypatch.setattr(bigquery_utils, "add_missing_columns", lambda *args: None)
+
+    def write_dataframe(df, table_id, schema, dataset_id, project=None):
+        client.load_table_from_dataframe(df, f"{dataset_id}.{table_id}")
+        return len(df)
+
+    monkeypatch.setattr(bigquery_utils, "write_dataframe", write_dataframe)
+    rows = weather_rows("407:-741", ["2025-06-01"], 20.0)
+    update_bigquery_table(rows, "weather_forecast", client=client)
+    update_bigquery_table(rows, "weather_forecast", client=client)
+
+    assert len(client.tables["weather_forecast"]) == 1
+
+
+def test_generation_is_bumped_once_per_update(client, monkeypatch):
+    bumps = []
+    monkeypatch.setattr(bigquery_utils, "get_bigquery_client", lambda: client)
+    monkeypatch.setattr(bigquery_utils, "ensure_dataset_and_tables", lambda *args: None)
+    monkeypatch.setattr(bigquery_utils, "bump_load_generation", lambda client, dataset_id: bumps.append(dataset_id))
+    delta = pd.DataFrame({
+        "event_id": ["e1"],
+        "event_name": ["Jazz Night"],
+        "event_date": pd.to_datetime(["2025-06-01"]),
+        "change_type": ["insert"],
+        "loaded_at": pd.Timestamp("2025-06-01 06:00", tz="UTC"),
+    })
+    weather = weather_rows("407:-741", ["2025-06-01"], 20.0)
+
+    update_bigquery_data(weather, delta)
+    assert bumps == ["weather_events"]
+    # Nothing new is loaded, so cached query results stay valid
+    update_bigquery_data(weather, delta)
+    assert bumps == ["weather_events"]
+
+
+def test_normalize_sql_keeps_quoted_text():
+    query = """
+    SELECT *  -- today's rows
+    FROM `weather_events.events_forecast`   # events
+    WHERE event_name = 'Punk -- Live'  /* quoted dashes */
+      AND venue = "Pier  17";
+    """
+    assert normalize_sql(query) == (
+        "SELECT * FROM `weather_events.events_forecast` "
+        "WHERE event_name = 'Punk -- Live' AND venue = \"Pier  17\""
+    )
+    assert normalize_sql(query) != normalize_sql(query.replace("Punk -- Live", "Punk"))
+
+
+def venue_rows(address, loaded_at):
+    return pd.DataFrame({
+        "venue_id": ["KovZpZA7AAEA"], "venue": ["Madison Square Garden"], "address": [address],
+        "city": ["New York"], "latitude": [40.75], "longitude": [-73.99],
+        "loaded_at": pd.Timestamp(loaded_at, tz="UTC"),
+    })
+
+
+def test_changed_venue_is_appended_as_a_new_version(client):
+    update_bigquery_table(venue_rows("4 Pennsylvania Plaza", "2025-06-01 06:00"), "venues", client=client)
+    update_bigquery_table(venue_rows("4 Pennsylvania Plaza", "2025-06-01 07:00"), "venues", client=client)
+    update_bigquery_table(venue_rows("4 Penn Plaza", "2025-06-01 08:00"), "venues", client=client)
+    # Moving back to an earlier address is still a change from the latest version
+    update_bigquery_table(venue_rows("4 Pennsylvania Plaza", "2025-06-01 09:00"), "venues", client=client)
+
+    assert client.tables["venues"]["address"].tolist() == [
+        "4 Pennsylvania Plaza", "4 Penn Plaza", "4 Pennsylvania Plaza",
+    ]
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+from google.cloud import bigquery
+
+from bq_storage_write import FakeStorageWriteBackend, write_dataframe
+
+SCHEMA = [bigquery.SchemaField("cell_id", "STRING"), bigquery.SchemaField("temperature_celsius", "FLOAT64")]
+
+
+class FailingBackend(FakeStorageWriteBackend):
+    """Rejects every append to one stream."""
+
+    def __init__(self, failing_stream):
+        super().__init__()
+        self.failing_stream = failing_stream
+
+    def append(self, stream_name, serialized_batch, offset):
+        if stream_name.endswith(f"/streams/{self.failing_stream}"):
+            raise Exception("append rejected")
+        super().append(stream_name, serialized_batch, offset)
+
+
+def rows(n):
+    return pd.DataFrame({"cell_id": [f"{i}:0" for i in range(n)], "temperature_celsius": 20.0})
+
+
+def test_write_commits_every_row():
+    backend = FakeStorageWriteBackend()
+    assert write_dataframe(rows(10), "weather_forecast", SCHEMA, backend=backend, chunk_rows=3, num_streams=2) == 10
+
+    loaded = backend.read_table(backend.table_path(None, "weather_events", "weather_forecast"))
+    assert sorted(loaded["cell_id"]) == sorted(rows(10)["cell_id"])
+
+
+def test_failed_append_finalizes_streams_without_committing(capsys):
+    backend = FailingBackend(failing_stream=1)
+    with pytest.raises(Exception, match="append rejected"):
+        write_dataframe(rows(10), "weather_forecast", SCHEMA, backend=backend, chunk_rows=3, num_streams=2)
+
+    assert backend.tables == {}
+    assert all(stream["finalized"] for stream in backend.streams.values())
+    assert "2 stream(s) left uncommitted" in capsys.readouterr().out
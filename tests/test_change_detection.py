@@ -0,0 +1,39 @@
+import pandas as pd
+
+from change_detection import detect_event_changes
+
+TODAY = pd.Timestamp("2025-06-01").date()
+
+
+def weather(temperature, precipitation_chance=0.1):
+    return pd.DataFrame({
+        "date": pd.to_datetime(["2025-06-01"]),
+        "cell_id": "407:-741",
+        "temperature_celsius": temperature,
+        "temp_min": temperature - 2,
+        "temp_max": temperature + 2,
+        "wind_speed": 3.0,
+        "precipitation_chance": precipitation_chance,
+        "weather_main": "Clear",
+    })
+
+
+def events():
+    return [{
+        "event_id": "e1", "event_date": "2025-06-01", "event_time": "19:00:00", "venue": "Central Park",
+        "status": "onsale", "price_min": 20.0, "price_max": 40.0, "cell_id": "407:-741",
+    }]
+
+
+def test_small_reading_change_does_not_update_events():
+    _, index = detect_event_changes(events(), {}, weather(20.0), today=TODAY)
+    delta, _ = detect_event_changes(events(), index, weather(20.1), today=TODAY)
+
+    assert delta == []
+
+
+def test_forecast_change_moving_the_comfort_level_updates_events():
+    _, index = detect_event_changes(events(), {}, weather(20.0), today=TODAY)
+    delta, _ = detect_event_changes(events(), index, weather(20.0, precipitation_chance=0.8), today=TODAY)
+
+    assert [event["change_type"] for event in delta] == ["update"]
@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+import etl_pipeline
+from weather_api import CELL_WEATHER_COLUMNS
+
+
+def test_run_without_events_transforms_to_empty_frames(monkeypatch):
+    monkeypatch.setenv("WEATHER_API_KEY", "test")
+    monkeypatch.setenv("EVENT_API_KEY", "test")
+    monkeypatch.setattr(etl_pipeline, "fetch_events_forecast_daily", lambda *args, **kwargs: [])
+
+    # A quiet day occupies no grid cells, so no weather is requested
+    weather_data, event_delta, _ = etl_pipeline.extract_data("Boston", [0], {})
+    weather_df, event_df = etl_pipeline.transform_frames(weather_data, event_delta)
+
+    assert weather_df.empty and list(weather_df.columns) == CELL_WEATHER_COLUMNS
+    assert event_df.empty
+
+
+def test_failed_github_upload_does_not_fail_the_run():
+    results = {name: True for name in etl_pipeline.DATA_SINKS}
+    results["github:output/venues.csv"] = False
+    etl_pipeline.check_sink_results(results)
+
+    results["bigquery:venues"] = False
+    with pytest.raises(Exception, match="bigquery:venues"):
+        etl_pipeline.check_sink_results(results)
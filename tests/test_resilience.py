@@ -0,0 +1,45 @@
+import time
+
+import pytest
+
+from quota_ledger import QuotaExceeded
+from resilience import EndpointGuard
+
+
+def test_quota_wait_is_not_recorded_as_latency():
+    guard = EndpointGuard("test:endpoint", policy={"hedge": True})
+    guard.call(lambda: {"ok": True}, cache_key="q", reserve=lambda: time.sleep(0.2))
+
+    assert guard.latencies[0] < 0.1
+
+
+def test_spent_quota_does_not_open_the_circuit():
+    guard = EndpointGuard("test:endpoint", policy={"failure_threshold": 1})
+
+    def reserve():
+        raise QuotaExceeded("test budget spent")
+
+    with pytest.raises(QuotaExceeded):
+        guard.call(lambda: {"ok": True}, reserve=reserve)
+
+    assert guard.failures == 0
+    assert guard.opened_at is None
+
+
+def test_hedged_duplicate_reserves_its_own_quota():
+    guard = EndpointGuard("test:endpoint", policy={"hedge": True, "hedge_min_samples": 1, "hedge_min_delay": 0.05})
+    guard.latencies.append(0.01)
+    reservations = []
+    calls = []
+
+    def request():
+        calls.append(None)
+        # The first request stalls past the hedge delay; the duplicate answers at once
+        if len(calls) == 1:
+            time.sleep(0.3)
+        return {"ok": True}
+
+    guard.call(request, reserve=lambda: reservations.append(None))
+
+    assert len(calls) == 2
+    assert len(reservations) == 2
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+import scheduler
+
+
+@pytest.fixture
+def runs(monkeypatch, tmp_path):
+    runs = []
+    monkeypatch.setattr(scheduler, "get_ledger", lambda: SimpleNamespace(remaining=lambda api: None))
+    monkeypatch.setattr(scheduler, "STATE_PATH", str(tmp_path / "state.json"))
+    return runs
+
+
+def tick(**kwargs):
+    scheduler.run_tick(["Boston"], state_path=scheduler.STATE_PATH, **kwargs)
+    return scheduler.load_state(scheduler.STATE_PATH)
+
+
+def test_failed_refresh_is_charged_and_backed_off(runs, monkeypatch):
+    def failing_pipeline(**kwargs):
+        runs.append(kwargs)
+        raise Exception("sink failed")
+
+    monkeypatch.setattr(scheduler, "etl_pipeline", failing_pipeline)
+    state = tick()
+    assert len(state["recent_runs"]) == scheduler.HORIZON_DAYS
+    assert state["failures"]["Boston|0"]["count"] == 1
+
+    # The next tick falls inside the backoff, so nothing is rerun
+    tick()
+    assert len(runs) == 1
+
+
+def test_github_publish_is_throttled(runs, monkeypatch):
+    monkeypatch.setattr(scheduler, "etl_pipeline", lambda **kwargs: runs.append(kwargs))
+    tick()
+    # Force the 15-minute slice due again
+    state = scheduler.load_state(scheduler.STATE_PATH)
+    state["last_refresh"]["Boston|0"] = "2000-01-01T00:00:00+00:00"
+    scheduler.save_state(state, scheduler.STATE_PATH)
+    tick()
+
+    assert [run["publish_github"] for run in runs] == [True, False]
@@ -0,0 +1,65 @@
+import pandas as pd
+
+from sharding import frame_to_ipc, ipc_to_frame, merge_shards, split_by_day
+
+
+def today_weather(cell_id, fetched_at):
+    # A day-0 shard holds the current-weather row and the noon-forecast row of each cell
+    return pd.DataFrame({
+        "date": pd.to_datetime(["2025-06-01", "2025-06-01"]),
+        "cell_id": cell_id,
+        "weather_main": ["Clear", "Clouds"],
+        "temperature_celsius": [21.0, 24.0],
+        "fetched_at": pd.Timestamp(fetched_at, tz="UTC"),
+    })
+
+
+def shard_result(city, weather_df):
+    return city, pd.Timestamp("2025-06-01").date(), frame_to_ipc(weather_df), frame_to_ipc(pd.DataFrame())
+
+
+def test_shared_cell_keeps_both_rows_of_today_once():
+    results = [
+        # Workers finish in any order; the merge follows (city, day)
+        shard_result("Newark", today_weather("407:-741", "2025-06-01 06:00:05")),
+        shard_result("Jersey City", today_weather("407:-741", "2025-06-01 06:00:01")),
+    ]
+    weather_df, _, _ = merge_shards(results, {}, today=pd.Timestamp("2025-06-01").date())
+
+    assert weather_df["weather_main"].tolist() == ["Clear", "Clouds"]
+    assert weather_df["fetched_at"].nunique() == 1
+    assert weather_df["fetched_at"].iloc[0] == pd.Timestamp("2025-06-01 06:00:01", tz="UTC")
+    assert "_shard" not in weather_df.columns
+
+
+def test_city_extract_is_split_into_one_shard_per_day():
+    weather_df = pd.concat([
+        today_weather("407:-741", "2025-06-01 06:00:01"),
+        today_weather("407:-741", "2025-06-01 06:00:01").assign(date=pd.Timestamp("2025-06-02")),
+    ], ignore_index=True)
+    event_df = pd.DataFrame({
+        "event_id": ["a", "b", "c"],
+        "event_date": [pd.Timestamp(day).date() for day in ["2025-06-01", "2025-06-03", "2025-06-03"]],
+        "cell_id": "407:-741",
+    })
+
+    days = split_by_day(frame_to_ipc(weather_df), frame_to_ipc(event_df))
+
+    # A day with events but no forecast still gets its shard
+    assert list(days) == [pd.Timestamp(day).date() for day in ["2025-06-01", "2025-06-02", "2025-06-03"]]
+    assert [len(ipc_to_frame(weather)) for weather, _ in days.values()] == [2, 2, 0]
+    assert [ipc_to_frame(events)["event_id"].tolist() for _, events in days.values()] == [["a"], [], ["b", "c"]]
+
+
+def test_index_entries_merge_in_city_order():
+    changed_by_city = {
+        "Newark": {"shared": ["newark", "2025-06-02"]},
+        "Jersey City": {"shared": ["jersey", "2025-06-02"], "past": ["jersey", "2025-06-02"]},
+    }
+    base_index = {"past": ["old", "2025-05-30"], "kept": ["old", "2025-06-03"]}
+
+    _, _, index = merge_shards([], base_index, changed_by_city, today=pd.Timestamp("2025-06-01").date())
+
+    assert index == {
+        "kept": ["old", "2025-06-03"], "shared": ["newark", "2025-06-02"], "past": ["jersey", "2025-06-02"],
+    }
@@ -0,0 +1,22 @@
+import os
+
+from venue_classifier import VenueClassifier
+
+
+def test_save_keeps_venues_saved_by_another_process(tmp_path):
+    cache_path = str(tmp_path / "venue_classes.json")
+    overrides_path = str(tmp_path / "overrides.json")
+    # Two workers start from the same (empty) cache and classify different venues
+    first = VenueClassifier(cache_path, overrides_path)
+    second = VenueClassifier(cache_path, overrides_path)
+    first.lookup("Central Park Bandshell")
+    second.lookup("Madison Square Garden Theater")
+
+    first.save()
+    second.save()
+
+    reloaded = VenueClassifier(cache_path, overrides_path)
+    assert reloaded.classes == {
+        "Central Park Bandshell": "outdoor", "Madison Square Garden Theater": "indoor",
+    }
+    assert os.listdir(tmp_path) == ["venue_classes.json"]
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import weather_api
+from quota_ledger import API_LIMITS, QuotaLedger
+
+LATENCY = 0.2
+
+
+def current_payload():
+    return {
+        "main": {"temp": 21.0, "feels_like": 20.5, "temp_min": 19.0, "temp_max": 23.0, "humidity": 60, "pressure": 1012},
+        "wind": {"speed": 3.0},
+        "clouds": {"all": 20},
+        "weather": [{"main": "Clear", "description": "clear sky"}],
+    }
+
+
+def forecast_payload():
+    noon = pd.Timestamp("today").normalize() + pd.Timedelta(days=1, hours=12)
+    return {"list": [{"dt_txt": f"{noon:%Y-%m-%d %H:%M:%S}", **current_payload()}]}
+
+
+class SlowSession:
+    """
+    Answers like OpenWeather after LATENCY seconds and records how many requests overlap.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(LATENCY)
+        with self.lock:
+            self.in_flight -= 1
+        payload = forecast_payload() if url.endswith("/forecast") else current_payload()
+        return type("Response", (), {"raise_for_status": lambda self: None, "json": lambda self: payload})()
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path):
+    session = SlowSession()
+    ledger = QuotaLedger(path=str(tmp_path / "quota.sqlite"), limits=API_LIMITS)
+    monkeypatch.setattr(weather_api, "_get_session", lambda: session)
+    monkeypatch.setattr(weather_api, "get_ledger", lambda: ledger)
+    return session
+
+
+def test_batch_requests_overlap_within_quota_limits(session):
+    locations = [{"lat": 40.7 + i / 10, "lon": -74.0} for i in range(4)]
+
+    start = time.monotonic()
+    frames = weather_api.fetch_weather_batch("key", locations, max_workers=4)
+    elapsed = time.monotonic() - start
+
+    assert len(frames) == 4 and all(len(frame) == 2 for frame in frames)
+    assert session.calls == 8
+    assert session.max_in_flight > 1
+    # Sequential calls would take 8 * LATENCY
+    assert elapsed < 4 * LATENCY
@@ -14,29 +14,51 @@ weather_schema = DataFrameSchema({
     "cloudiness": Column(pa.Float),
     "precipitation_chance": Column(pa.Float, checks=pa.Check.greater_than_or_equal_to(0)),
     "weather_main": Column(pa.String),
-    "weather_description": Column(pa.String)
+    "weather_description": Column(pa.String),
+    "cell_id": Column(pa.String),
+    "latitude": Column(pa.Float, nullable=True),
+    "longitude": Column(pa.Float, nullable=True)
 })
 
 event_schema = DataFrameSchema({
+    "event_id": Column(pa.String, nullable=True),
     "event_name": Column(pa.String),
     "event_date": Column(pa.DateTime),
     "event_time": Column(pa.String),
     "event_url": Column(pa.String, nullable=True),
     "image_url": Column(pa.String, nullable=True),
+    "venue_id": Column(pa.String, nullable=True),
     "venue": Column(pa.String),
     "address": Column(pa.String),
     "city": Column(pa.String),
+    "latitude": Column(pa.Float, nullable=True),
+    "longitude": Column(pa.Float, nullable=True),
+    "cell_id": Column(pa.String),
     "price_min": Column(pa.Float, nullable=True),
     "price_max": Column(pa.Float, nullable=True),
     "category": Column(pa.String),
     "free_or_paid": Column(pa.String, checks=pa.Check.isin(["Free", "Paid"])),
     "status": Column(pa.String, checks=pa.Check.isin([
         "scheduled", "cancelled", "postponed", "onsale", "offsale", "rescheduled", "closed", "moved"
-    ]))
+    ])),
+    "recommendation_confidence": Column(pa.Float, checks=pa.Check.in_range(0, 1), nullable=True, required=False),
+    "change_type": Column(pa.String, checks=pa.Check.isin(["insert", "update", "cancel"]), required=False)
+})
+
+venue_schema = DataFrameSchema({
+    "venue_id": Column(pa.String, unique=True),
+    "venue": Column(pa.String),
+    "address": Column(pa.String),
+    "city": Column(pa.String),
+    "latitude": Column(pa.Float, nullable=True),
+    "longitude": Column(pa.Float, nullable=True)
 })
 
 def validate_weather(df):
     return weather_schema.validate(df)
 
 def validate_events(df):
-    return event_schema.validate(df)
\ No newline at end of file
+    return event_schema.validate(df)
+
+def validate_venues(df):
+    return venue_schema.validate(df)
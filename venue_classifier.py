@@ -0,0 +1,169 @@
+# venue_classifier.py
+import argparse
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_PATH = "output/venue_classes.json"
+DEFAULT_OVERRIDES_PATH = "venue_overrides.json"
+
+# Bump whenever the keywords change so cached classifications are recomputed
+RULES_VERSION = 1
+
+VENUE_CLASSES = ["indoor", "outdoor", "unknown"]
+
+INDOOR_KEYWORDS = [
+    "indoor", "club", "theater", "theatre", "center", "centre", "auditorium", "hall",
+    "ballroom", "arena", "lounge", "bar", "cafe", "church", "cathedral", "museum", "gallery",
+    "studio", "studios", "playhouse", "opera", "cinema", "library", "casino", "house",
+]
+
+OUTDOOR_KEYWORDS = [
+    "outdoor", "outdoors", "park", "field", "stadium", "amphitheater", "amphitheatre", "ballpark",
+    "garden", "gardens", "pier", "beach", "lawn", "plaza", "bandshell", "racetrack", "speedway",
+    "fairgrounds", "grounds", "green", "rooftop", "zoo",
+]
+
+# One alternation over both lists, scanned once per name; whole words only, so
+# "Amphitheater" is not read as "theater" and "Barclays" not as "bar"
+_KEYWORD_PATTERN = re.compile(
+    r"\b(?:(?P<indoor>{})|(?P<outdoor>{}))\b".format(
+        "|".join(map(re.escape, INDOOR_KEYWORDS)), "|".join(map(re.escape, OUTDOOR_KEYWORDS))
+    ),
+    re.IGNORECASE,
+)
+
+
+def classify_venue_name(name):
+    """
+    Classify a venue name as "indoor", "outdoor" or "unknown" from its keywords.
+    When both kinds appear, the last one wins: it is usually the head noun
+    ("Central Park Bandshell", "Brooklyn Museum Garden").
+    """
+    if not isinstance(name, str):
+        return "unknown"
+    venue_class = "unknown"
+    for match in _KEYWORD_PATTERN.finditer(name):
+        venue_class = match.lastgroup
+    return venue_class
+
+
+class VenueClassifier:
+    """
+    Venue name -> indoor/outdoor lookup backed by a persistent cache.
+
+    Manual overrides (a JSON object of venue name -> class) always win. Other names are
+    classified by keyword once and remembered in the cache file across runs.
+    """
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, overrides_path=DEFAULT_OVERRIDES_PATH):
+        self.cache_path = cache_path
+        self.overrides_path = overrides_path
+        self.overrides = self._read_overrides()
+        self.classes = self._read_cache()
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def _read_overrides(self):
+        try:
+            with open(self.overrides_path, "r") as f:
+                overrides = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        invalid = {name: cls for name, cls in overrides.items() if cls not in VENUE_CLASSES}
+        if invalid:
+            raise ValueError(f"Invalid venue override class(es) in {self.overrides_path}: {invalid}")
+        return overrides
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if not isinstance(stored, dict) or stored.get("version") != RULES_VERSION:
+            print("Venue class cache is from other rules, reclassifying venues")
+            return {}
+        return stored["venues"]
+
+    def lookup(self, name):
+        """
+        Return the class of one venue name.
+        """
+        if name in self.overrides:
+            return self.overrides[name]
+        venue_class = self.classes.get(name)
+        if venue_class is None:
+            venue_class = classify_venue_name(name)
+            if isinstance(name, str):
+                with self.lock:
+                    self.classes[name] = venue_class
+                    self.dirty = True
+        return venue_class
+
+    def lookup_many(self, names):
+        """
+        Return an array with the class of every name, classifying each distinct name once.
+        """
+        names = pd.Series(names, dtype="object")
+        codes, uniques = pd.factorize(names)
+        classes = np.array([self.lookup(name) for name in uniques] + ["unknown"], dtype=object)
+        # factorize gives missing names code -1, which picks the trailing "unknown"
+        return classes[codes]
+
+    def save(self):
+        """
+        Atomically write newly classified venues to the cache file, keeping the venues
+        other processes wrote to it since this one read it.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            self.classes = {**self._read_cache(), **self.classes}
+            # Sharded runs save from several processes at once; each writes its own temp file
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"version": RULES_VERSION, "venues": self.classes}, f, indent=0, sort_keys=True)
+            os.replace(tmp_path, self.cache_path)
+            self.dirty = False
+
+    def set_override(self, name, venue_class):
+        """
+        Pin the class of a venue in the overrides file.
+        """
+        if venue_class not in VENUE_CLASSES:
+            raise ValueError(f"Venue class must be one of {VENUE_CLASSES}, got {venue_class!r}")
+        self.overrides[name] = venue_class
+        with open(self.overrides_path, "w") as f:
+            json.dump(self.overrides, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+_classifier = None
+
+def get_venue_classifier():
+    """
+    Return the process-wide classifier backed by the default cache and overrides files.
+    """
+    global _classifier
+    if _classifier is None:
+        _classifier = VenueClassifier()
+    return _classifier
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up or override venue indoor/outdoor classes")
+    parser.add_argument("venue", help="Venue name as reported by Ticketmaster")
+    parser.add_argument("--set", choices=VENUE_CLASSES, help="Pin the venue to this class")
+    args = parser.parse_args()
+
+    classifier = get_venue_classifier()
+    if args.set:
+        classifier.set_override(args.venue, args.set)
+    source = "override" if args.venue in classifier.overrides else "keywords"
+    print(f"{args.venue}: {classifier.lookup(args.venue)} ({source})")
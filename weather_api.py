@@ -1,16 +1,62 @@
-import requests
 import pandas as pd
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from geo_grid import CITY_CELL_PREFIX
+from event_api import create_session_with_retry
+from quota_ledger import get_ledger, run_within_quota
+from resilience import get_guard, request_key
 
-def fetch_weather_forecast(api_key, city="New York"):
-    # Fetch current weather data for today
-    current_url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-    current_response = requests.get(current_url)
-    current_response.raise_for_status()
-    current_data = current_response.json()
+BASE_URL = "http://api.openweathermap.org/data/2.5"
 
-    # Create a dictionary for current weather metrics
-    current_weather = {
+# Keep-alive connections shared by concurrent lookups
+POOL_SIZE = 32
+
+WEATHER_COLUMNS = [
+    "date", "temperature_celsius", "feels_like", "temp_min", "temp_max",
+    "humidity", "pressure", "wind_speed", "cloudiness", "precipitation_chance",
+    "weather_main", "weather_description"
+]
+
+# Columns of the per-cell weather rows returned by fetch_weather_for_cells
+CELL_WEATHER_COLUMNS = WEATHER_COLUMNS + ["cell_id", "latitude", "longitude", "fetched_at"]
+
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session_with_retry(pool_maxsize=POOL_SIZE, retries=1, quota_guarded=True)
+    return _session
+
+def _get(endpoint, params):
+    guard = get_guard(f"openweather:{endpoint}")
+
+    def request():
+        response = _get_session().get(f"{BASE_URL}/{endpoint}", params=params, timeout=guard.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def reserve():
+        get_ledger().reserve("openweather")
+
+    # Timeouts, circuit breaking, hedging and the stale-response fallback are per endpoint.
+    # Every request sent, hedged duplicates included, is booked in the shared quota ledger
+    return guard.call(request, cache_key=request_key(params), reserve=reserve)
+
+def _location_params(api_key, city, lat, lon):
+    # Coordinates take precedence over the city name when both are given
+    params = {"appid": api_key, "units": "metric"}
+    if lat is not None and lon is not None:
+        params.update(lat=lat, lon=lon)
+    else:
+        params["q"] = city
+    return params
+
+def _parse_current(current_data):
+    return {
         "date": pd.to_datetime("today").normalize(),  # Today's date at midnight
         "temperature_celsius": current_data["main"]["temp"],
         "feels_like": current_data["main"]["feels_like"],
@@ -25,35 +71,49 @@ def fetch_weather_forecast(api_key, city="New York"):
         "weather_description": current_data["weather"][0]["description"]
     }
 
-    # Fetch 5-day forecast data (3-hour intervals)
-    forecast_url = f"http://api.openweathermap.org/data/2.5/forecast?q={city}&appid={api_key}&units=metric"
-    forecast_response = requests.get(forecast_url)
-    forecast_response.raise_for_status()
-    forecast_data = forecast_response.json()
-
-    # Select only the forecast entries at 12:00 PM each day
-    forecast_list = forecast_data["list"]
-    daily_forecast = []
-    for entry in forecast_list:
-        timestamp = pd.to_datetime(entry["dt_txt"])
-        if timestamp.hour == 12:
-            daily_forecast.append({
-                "date": timestamp.normalize(),  # Forecast date at midnight
-                "temperature_celsius": entry["main"]["temp"],
-                "feels_like": entry["main"]["feels_like"],
-                "temp_min": entry["main"]["temp_min"],
-                "temp_max": entry["main"]["temp_max"],
-                "humidity": entry["main"]["humidity"],
-                "pressure": entry["main"]["pressure"],
-                "wind_speed": entry["wind"]["speed"],
-                "cloudiness": entry["clouds"]["all"],
-                "precipitation_chance": entry.get("rain", {}).get("3h", 0) / 100,
-                "weather_main": entry["weather"][0]["main"],
-                "weather_description": entry["weather"][0]["description"]
-            })
+def _parse_forecast(forecast_data):
+    """
+    Turn the 3-hourly forecast list into one row per day at 12:00, in a single vectorized pass.
+    """
+    entries = pd.json_normalize(forecast_data["list"])
+    if entries.empty:
+        return pd.DataFrame(columns=WEATHER_COLUMNS)
+
+    timestamps = pd.to_datetime(entries["dt_txt"])
+    noon = (timestamps.dt.hour == 12).to_numpy()
+    entries = entries[noon]
+    first_weather = entries["weather"].str[0]
+    rain = entries["rain.3h"] if "rain.3h" in entries.columns else pd.Series(0.0, index=entries.index)
+
+    return pd.DataFrame({
+        "date": timestamps[noon].dt.normalize(),  # Forecast date at midnight
+        "temperature_celsius": entries["main.temp"],
+        "feels_like": entries["main.feels_like"],
+        "temp_min": entries["main.temp_min"],
+        "temp_max": entries["main.temp_max"],
+        "humidity": entries["main.humidity"],
+        "pressure": entries["main.pressure"],
+        "wind_speed": entries["wind.speed"],
+        "cloudiness": entries["clouds.all"],
+        "precipitation_chance": rain.fillna(0) / 100,
+        "weather_main": first_weather.str.get("main"),
+        "weather_description": first_weather.str.get("description"),
+    }).reset_index(drop=True)
+
+def fetch_weather_forecast(api_key, city="New York", lat=None, lon=None):
+    params = _location_params(api_key, city, lat, lon)
+
+    # Current weather and the 5-day forecast (3-hour intervals) are requested concurrently
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        forecast_future = executor.submit(_get, "forecast", params)
+        current_data = _get("weather", params)
+        forecast_data = forecast_future.result()
 
     # Combine current weather with daily forecasts
-    weather_df = pd.DataFrame([current_weather] + daily_forecast)
+    weather_df = pd.concat(
+        [pd.DataFrame([_parse_current(current_data)]), _parse_forecast(forecast_data)],
+        ignore_index=True
+    )
 
     # Filter to only include today through 4 days ahead
     today = pd.to_datetime("today").normalize()
@@ -62,4 +122,68 @@ def fetch_weather_forecast(api_key, city="New York"):
         (weather_df["date"] >= today) & (weather_df["date"] <= end_date)
     ].reset_index(drop=True)
 
-    return weather_df
\ No newline at end of file
+    return weather_df
+
+def fetch_weather_batch(api_key, locations, max_workers=8):
+    """
+    Fetch forecasts for many locations concurrently over the pooled session.
+
+    Args:
+        api_key: OpenWeather API key
+        locations: list of dicts with either "city" or "lat"/"lon" keys
+        max_workers: number of locations fetched concurrently
+
+    Returns:
+        List of weather DataFrames in the order of locations
+    """
+    def fetch_location(location):
+        return fetch_weather_forecast(
+            api_key,
+            city=location.get("city", "New York"),
+            lat=location.get("lat"),
+            lon=location.get("lon")
+        )
+
+    frames = []
+    for location, result in run_within_quota(fetch_location, locations, max_workers=max_workers):
+        if isinstance(result, Exception):
+            raise result
+        frames.append(result)
+    return frames
+
+def fetch_weather_for_cells(api_key, cells, city="New York", max_workers=8):
+    """
+    Fetch the forecast once per occupied grid cell.
+
+    Args:
+        api_key: OpenWeather API key
+        cells: dict mapping cell id to its (lat, lon) center, as returned by geo_grid.assign_cells
+        city: city name used when a cell without coordinates does not name its own city
+        max_workers: number of cells fetched concurrently
+
+    Returns:
+        DataFrame of daily weather rows tagged with cell_id, latitude, longitude and fetched_at
+    """
+    locations = []
+    for cell_id, center in cells.items():
+        if center is None:
+            cell_city = cell_id[len(CITY_CELL_PREFIX):] if cell_id.startswith(CITY_CELL_PREFIX) else city
+            locations.append({"cell_id": cell_id, "city": cell_city, "lat": None, "lon": None})
+        else:
+            locations.append({"cell_id": cell_id, "city": city, "lat": center[0], "lon": center[1]})
+
+    frames = fetch_weather_batch(api_key, locations, max_workers=max_workers)
+    if not frames:
+        # A run without events has no cells; downstream steps still expect the weather columns
+        return pd.DataFrame(columns=CELL_WEATHER_COLUMNS)
+
+    # Refreshed forecasts are loaded as new versions of their (cell, date) rows
+    fetched_at = pd.Timestamp.now(tz="UTC")
+    for location, cell_df in zip(locations, frames):
+        cell_df["cell_id"] = location["cell_id"]
+        cell_df["latitude"] = location["lat"]
+        cell_df["longitude"] = location["lon"]
+        cell_df["fetched_at"] = fetched_at
+    weather_df = pd.concat(frames, ignore_index=True)
+    weather_df[["latitude", "longitude"]] = weather_df[["latitude", "longitude"]].apply(pd.to_numeric)
+    return weather_df